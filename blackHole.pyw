@@ -3,15 +3,14 @@
 Black hole solitaire
 '''
 from model import Model
-from view import View
+from view import View, AUTOPLAY_SPEEDS
 try:
     import tkinter as tk
     from tkinter.messagebox import showerror, showinfo, askokcancel
 except ImportError:
     import Tkinter as tk
     from tkMessageBox import showerror, showinfo, askokcancel
-import sys, os
-import  subprocess
+import os
 
 helpText = '''
 This program implements Black Hole solitaire.
@@ -41,30 +40,37 @@ BUTTONS
 
 The "Undo" and Redo" buttons are self-explanatory.  \
 The "Restart" button puts the game back to the beginning, but you can \
-still redo all your moves.  The "Solve" button finds a solution, \
-or reports that none exists  \
-If a solution is found, the game is set to the start and you can see the solution \
-by repeatedly pressing "Redo."  
+still redo all your moves.  The "Solve" button finds a solution \
+from the current position, or reports that none exists.  \
+If a solution is found, you can see the rest of it \
+by repeatedly pressing "Redo," or press "Play" to watch it play out \
+at the pace set in the Speed menu.  "Play" turns into "Pause" while it runs.  \
+The slider at the bottom of the window moves through the game: drag it \
+to go to any move.  
 
 Occasionally, the solver will not be able to determine \
-whether a solution exists, because of resource limitations.  Then you will be offered \
-the opportunity to save the game for later analysis.
+whether a solution exists, because of resource limitations.  Then the search goes \
+on in the background, and Solve will have the answer once it is found.  You will also \
+be offered the opportunity to save the game for later analysis.
 '''        
 class BlackHole:
     def __init__(self):
-        cwd = os.getcwd()
-        progDir= os.path.dirname(sys.argv[0])
-        self.runDir = os.path.join(cwd, progDir)       
+        self.runDir = os.path.dirname(os.path.abspath(__file__))
+        self.helpText = None            # built when first shown
         model = self.model = Model(self)
+        model.startPool()
+        model.openCache()
+        model.openLog()
+        model.resumeSearches()
         model.shuffle()
         model.deal()
         self.view = View(self, self.quit)
         self.makeMenu() 
-        self.makeHelp()
         self.view.start()      #  start the event loop
 
     def deal(self):
         model = self.model
+        self.view.pause()
         model.deal()
         self.view.show()
 
@@ -99,18 +105,23 @@ class BlackHole:
         game.add_command(label='Quit', command=self.quit)
         top.add_cascade(label='Game', menu=game)     
 
+        speed = tk.Menu(top, tearoff=False)
+        for label, delay in AUTOPLAY_SPEEDS:
+            speed.add_radiobutton(label=label, variable=self.view.speed, value=delay,
+                                  command=self.view.setSpeed)
+        top.add_cascade(label='Speed', menu=speed)
+
     def notdone(self):
         showerror('Not implemented', 'Not yet available') 
 
     def showHelp(self):
+        if self.helpText is None:
+            self.makeHelp()
         self.helpText.deiconify()
         self.helpText.text.see('1.0')  
         
     def quit(self):
-        try:
-            self.model.solverProc.kill()
-        except:
-            pass
+        self.model.shutdown()
         self.view.root.quit()
 
 if __name__ == "__main__":
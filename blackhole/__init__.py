@@ -0,0 +1,5 @@
+# __init__.py Command line entry point for black hole
+'''
+python -m blackhole runs the game: the Tk window by default, or
+solve, play and bench from the command line without Tk.
+'''
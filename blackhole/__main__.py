@@ -0,0 +1,178 @@
+# __main__.py Command line interface to black hole
+'''
+    python -m blackhole [gui]            the game in a Tk window
+    python -m blackhole solve [deal]     solve a deal and print the moves
+    python -m blackhole play [deal]      play a deal in the terminal
+    python -m blackhole bench            time startup and solving
+    python -m blackhole sheet            pack the card images into one
+
+A deal is a PySol game number (--deal), a board file (--board) or a
+random shuffle (the default, or --seed for a repeatable one).  Only the
+gui and sheet commands import tkinter.
+'''
+import os
+import sys
+import time
+import random
+import argparse
+import subprocess
+
+RUN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RUN_DIR not in sys.path:
+    sys.path.insert(0, RUN_DIR)
+
+from model import Model, MAX_ITERS
+from solver import deals
+from solver.engine import Search, parseBoard, SOLVED, UNSOLVED
+
+# Seconds from starting Python to being ready, checked by bench
+STARTUP_TARGETS = (('cli', 'import model, solver.engine', 0.25),
+                   ('gui', 'import model, view', 0.5))
+
+def dealModel(args):
+    '''
+    A Model dealt as the options say
+    '''
+    model = Model()
+    byCode = {card.code: card for card in model.deck}
+    if args.deal is not None:
+        codes = deals.deal(args.deal, not args.pysol)
+    elif args.board is not None:
+        with open(args.board) as fin:
+            piles, hole = parseBoard(fin.read())
+        if any(len(p) != 3 for p in piles):
+            sys.exit('%s is not a deal: every pile should have 3 cards' % args.board)
+        codes = [hole] + [piles[k][d] for d in range(3) for k in range(17)]
+        codes = [code.replace('10', 'T') for code in codes]     # boards made without -t
+    else:
+        rand = random.Random(args.seed)
+        codes = [model.deck[0].code] + [c.code for c in rand.sample(model.deck[1:], 51)]
+    model.shuffle([byCode[code] for code in codes])
+    model.deal(False)
+    return model
+
+def solveHere(model, maxIters):
+    '''
+    Solve the current position in process.  A solution goes on the
+    redo stack.  Returns the status and the search.
+    '''
+    search = Search(*parseBoard(model.boardString()))
+    status = search.run(maxIters)
+    if status == SOLVED:
+        model.redoStack = list(reversed(search.moves))
+    return status, search
+
+def describe(model):
+    '''
+    The position as text, one pile a line
+    '''
+    lines = ['hole: %s' % model.hole[-1]]
+    for k, pile in enumerate(model.tableau):
+        mark = '*' if model.canMove(k) else ' '
+        lines.append('%2d%s %s' % (k, mark, ' '.join(str(card) for card in pile)))
+    return '\n'.join(lines)
+
+def solve(args):
+    model = dealModel(args)
+    start = time.time()
+    status, search = solveHere(model, args.max_iters)
+    print(status)
+    if status == SOLVED:
+        while model.canRedo():
+            k = model.redoStack[-1]
+            print('%2d %s' % (k, model.tableau[k][-1]))
+            model.redo()
+    print('%d positions in %.2fs' % (search.iterations, time.time() - start))
+    return 0 if status == SOLVED else 1
+
+def play(args):
+    model = dealModel(args)
+    help = 'pile number to move, u undo, r redo, s solve, q quit'
+    print(help)
+    while True:
+        print(describe(model))
+        if model.won():
+            print('Won!')
+            return 0
+        if model.blocked():
+            print('No more moves')
+        try:
+            cmd = input('> ').strip().lower()
+        except EOFError:
+            return 0
+        if cmd == 'q':
+            return 0
+        elif cmd == 'u' and model.canUndo():
+            model.undo()
+        elif cmd == 'r' and model.canRedo():
+            model.redo()
+        elif cmd == 's':
+            status, search = solveHere(model, args.max_iters)
+            print('%s: %s' % (status, 'press r to step through it' if status == SOLVED
+                              else 'no solution from here' if status == UNSOLVED
+                              else 'gave up'))
+        elif cmd.isdigit() and int(cmd) < 17:
+            if not model.move(int(cmd)):
+                print('That card can not go on the hole')
+        else:
+            print(help)
+
+def startup(statement):
+    '''
+    Seconds for a fresh Python to run statement
+    '''
+    start = time.time()
+    subprocess.check_call([sys.executable, '-c', statement], cwd=RUN_DIR)
+    return time.time() - start
+
+def bench(args):
+    for name, statement, target in STARTUP_TARGETS:
+        try:
+            seconds = min(startup(statement) for _ in range(3))
+        except subprocess.CalledProcessError:
+            print('%s startup: failed (%s)' % (name, statement))
+            continue
+        print('%s startup: %.3fs (target %.2fs) %s' %
+              (name, seconds, target, 'ok' if seconds <= target else 'SLOW'))
+    states = 0
+    start = time.time()
+    for n in range(1, args.deals+1):
+        args.deal = n
+        status, search = solveHere(dealModel(args), args.max_iters)
+        states += search.iterations
+    seconds = time.time() - start
+    print('solved PySol deals 1-%d: %d positions in %.2fs, %.0f a second' %
+          (args.deals, states, seconds, states / seconds))
+    return 0
+
+def gui(args):
+    import runpy
+    runpy.run_path(os.path.join(RUN_DIR, 'blackHole.pyw'), run_name='__main__')
+    return 0
+
+def sheet(args):
+    from view import makeSheet
+    makeSheet(os.path.join(RUN_DIR, 'cards'))
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m blackhole',
+                                     description='Black Hole solitaire.')
+    parser.add_argument('command', nargs='?', default='gui',
+                        choices=['gui', 'solve', 'play', 'bench', 'sheet'])
+    parser.add_argument('--deal', type=int, help='PySol game number')
+    parser.add_argument('--pysol', action='store_true',
+                        help='deal as PySol rather than PySolFC')
+    parser.add_argument('--board', help='board file in the solver format')
+    parser.add_argument('--seed', type=int, help='seed for a random deal')
+    parser.add_argument('--max-iters', type=int, default=MAX_ITERS)
+    parser.add_argument('--deals', type=int, default=20, help='deals for bench')
+    args = parser.parse_args(argv)
+    if args.deal is not None and not 1 <= args.deal <= deals.MAX_DEAL:
+        parser.error('--deal must be from 1 to %d' % deals.MAX_DEAL)
+    command = {'gui': gui, 'solve': solve, 'play': play, 'bench': bench,
+               'sheet': sheet}[args.command]
+    return command(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
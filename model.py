@@ -1,16 +1,49 @@
 # model.py Model for black hole
 import random
 import itertools 
+import collections
 import sys
 import os
-import subprocess
-import re
+import time
+from solver.supervisor import SolverProcess
+from solver.pool import SolverPool
+from solver.cache import SolutionCache, CachedSolve, boardKey, DEFAULT_CACHE
+from solver.engine import Search, parseBoard
+from solver.records import SolveLog, DEFAULT_LOG
+from solver import checkpoint, prefilter, beam
 
 ACE = 1
 JACK = 11
 QUEEN = 12
 KING = 13
 ALLRANKS = range(1, 14)      # one more than the highest value
+HOLE = 17                    # pile number of the black hole in Model.location
+# NEIGHBORS[r] are the ranks that can go on a card of rank r
+NEIGHBORS = [()] + [(r%13 + 1, (r-2)%13 + 1) for r in ALLRANKS]
+
+# 'python' runs the solver package in this directory, which works
+# everywhere; 'binary' runs the compiled black-hole-solve, which is
+# built for the Mac.
+SOLVER_BACKENDS = ('python', 'binary')
+RUN_DIR = os.path.dirname(os.path.abspath(__file__))   # where the solver and savedGames are
+MAX_ITERS = 75000000
+# A solve in the pool runs with each budget in turn, resuming the search
+# from a checkpoint each time, and is then finished in the background.
+# The last budget's search keeps the positions it has seen in a
+# StateTable that spills to disk, since a set of 75M would not fit in
+# SOLVER_MEMORY.
+BUDGETS = (1000000, 10000000, MAX_ITERS)
+DISPLAY_STEP = 100000        # iterations between progress reports
+SOLVER_TIMEOUT = 900         # seconds of wall clock time per solve
+SOLVER_MEMORY = 4 << 30      # bytes of address space per solve
+PRESOLVE_DEALS = 2           # deals shuffled and solved ahead of time
+PRESOLVE_ITERS = 2000000     # iteration budget for solving a deal ahead of time
+PRESOLVE_PRIORITY = 1        # pool priority of those solves (0 is the current deal)
+QUICK_ITERS = 50000          # budget for solving a position in process before using the pool
+FINISH_PRIORITY = 2          # pool priority of searches finished with no budget
+FINISH_RAM = 1 << 30         # bytes of visited states held in memory by those searches
+RUNG_RAM = SOLVER_MEMORY // 2   # the same for the search with the last budget
+SPILL_DIR = os.path.join(checkpoint.DEFAULT_DIR, 'spill')   # where they keep the rest
 
 # RANKNAMES is a list that maps a rank to a string.  It contains a
 # dummy element at index 0 so it can be indexed directly with the card
@@ -29,15 +62,28 @@ else:
 def cardCode(rank, suit):
     return RANK_NAMES[rank]+suit
 
+def deckString(deck):
+    '''
+    The board dealt from deck, in the solver's format
+    '''
+    board = 'Foundations: %s\n' % deck[0].code
+    for k in range(1, 18):
+        board += '%s %s %s\n' % (deck[k].code, deck[k+17].code, deck[k+34].code)
+    return board
+
 class Card:
     '''
-    A card is identified by its suit and rank.
+    A card is identified by its suit and rank.  ident is its index in
+    the deck as first created, 0 to 51.
     '''
-    def __init__(self, rank, suit):
+    __slots__ = ('rank', 'suit', 'color', 'code', 'ident')
+
+    def __init__(self, rank, suit, ident=0):
         self.rank = rank
         self.suit = suit
         self.color = 0 if suit in 'HD' else 1
         self.code =cardCode(rank, suit)
+        self.ident = ident
 
     def __repr__(self):
         return self.code
@@ -51,19 +97,68 @@ class Pile(list):
     def __initi__(self):
         list.__init__(self)
     
-    def find(self, code):
-        '''
-        Is the card with the given code is in the pile?
-        '''
-        for idx, card in enumerate(self):
-            if card.code == code:
-                return True
-        return False      
-    
     def clear(self):
         self[:] = []
         
     
+def idRank(cardId):
+    '''
+    Rank of the card with the given id (cards are created rank by rank)
+    '''
+    return cardId // len(SUIT_NAMES) + 1
+
+class State:
+    '''
+    A position in compact form: deal holds the ids of the cards in deck
+    order (so pile k is deal[k+1::17] from the bottom up), heights the
+    number of cards left on each pile, and moves the piles played from,
+    in order.  Copying one copies at most about 120 bytes, so it is the
+    thing to use for trying moves out without touching the game.
+    '''
+    __slots__ = ('deal', 'heights', 'moves')
+
+    def __init__(self, deal, heights, moves):
+        self.deal = deal
+        self.heights = bytearray(heights)
+        self.moves = bytearray(moves)
+
+    def fork(self):
+        return State(self.deal, self.heights, self.moves)
+
+    def top(self, k):
+        '''
+        Id of the top card of pile k, or None if it is empty
+        '''
+        h = self.heights[k]
+        return self.deal[k+1+17*(h-1)] if h else None
+
+    def holeTop(self):
+        if not self.moves:
+            return self.deal[0]
+        k = self.moves[-1]
+        return self.deal[k+1+17*self.heights[k]]
+
+    def canMove(self, k):
+        top = self.top(k)
+        return top is not None and idRank(top) in NEIGHBORS[idRank(self.holeTop())]
+
+    def legalMoves(self):
+        return [k for k in range(17) if self.canMove(k)]
+
+    def move(self, k):
+        if not self.canMove(k):
+            return False
+        self.heights[k] -= 1
+        self.moves.append(k)
+        return True
+
+    def undo(self):
+        k = self.moves.pop()
+        self.heights[k] += 1
+
+    def won(self):
+        return len(self.moves) == 51
+
 class Model:
     '''
     The cards are all in self.deck, and are copied into the tableau piles
@@ -73,45 +168,83 @@ class Model:
         f is a boolean indicating whether or not the top card of the source stack is flipped,
         except that the entry (0, 0, 10, 0) connotes dealing a row of cards. 
       '''
-    def __init__(self, parent):
+    def __init__(self, parent=None):
+        # parent is the application, if any; the model needs only its runDir
         self.parent = parent
-        self.solnPattern = re.compile(r'Move.*?([0-9]+).*?foundations')
+        self.runDir = parent.runDir if parent is not None else RUN_DIR
         random.seed()
         self.deck = []
         self.undoStack = []
         self.redoStack = []
         self.createCards()
+        self.cards = list(self.deck)    # cards by id
+        self.dealIds = bytes(52)        # ids of the cards in deck order
+        self.heights = bytearray(17)    # number of cards on each pile
+        self.marks = None               # (line, heights after each move, card moved)
         self.tableau = [ Pile() for _ in range(17) ]
         self.hole = [ ] 
+        self.exposed = [set() for _ in range(KING+1)]   # piles with each rank on top
+        self.location = {}           # card code -> (pile, depth), pile HOLE for the black hole
         self.solverProc = None
+        self.backend = 'python'
+        self.pool = None
+        self.cache = None
+        self.log = None
+        self.tracked = {}            # solves not yet finished: id(proc) -> (proc, board, source)
+        self.logged = set()          # ids of the pool jobs already logged
+        self.upcoming = collections.deque()   # (deck, job) for deals solved ahead
+        self.presolveDeals = PRESOLVE_DEALS
+        self.speculative = False
+        self.solveFrom = []          # undoStack when the current solve was started
+        self.budget = 0              # index in BUDGETS of the current solve's budget
+        self.finishing = []          # pool jobs finishing searches that ran out of budget
+        self.portfolio = True        # race several solver configurations when there are cores
         
-    def shuffle(self):
+    def shuffle(self, deck=None):
+        '''
+        Shuffle the deck, or put it in the order given
+        '''
         for w in self.tableau:
             w.clear()
+        for piles in self.exposed:
+            piles.clear()
+        self.location.clear()
         self.hole[:] = []
-        d = self.deck[1:]
-        random.shuffle(d)
-        self.deck[1:]=d
-        self.solved=False
+        self.heights[:] = bytes(17)
+        self.marks = None
+        if deck is None:
+            d = self.deck[1:]
+            random.shuffle(d)
+            self.deck[1:]=d
+        else:
+            self.deck[:] = deck
+        self.dealIds = bytes(card.ident for card in self.deck)
 
     def createCards(self):
         for rank, suit in itertools.product(ALLRANKS, SUIT_NAMES):
-            self.deck.append(Card(rank, suit))
+            self.deck.append(Card(rank, suit, len(self.deck)))
             
     def deal(self, shuffle=True):
+        job = None
         if shuffle:
-            self.shuffle()
-        for n, card in enumerate(self.deck[1:]):
-            self.tableau[n%17].append(card)
-        self.hole = [self.deck[0]]
+            if self.upcoming:
+                deck, job = self.upcoming.popleft()
+                self.shuffle(deck)
+            else:
+                self.shuffle()
         self.undoStack = []
         self.redoStack = []         
+        self.place([3]*17, [self.deck[0]])
       
         # *** SIDE EFFECTS  ***
         # solve will set self.solverProc, self.board
         # and self.solution    
         if shuffle:
-            self.solve()
+            if job is None:
+                self.solve()
+            else:
+                self.adopt(job)
+            self.presolve()
    
     def move(self, k):
         '''
@@ -119,31 +252,95 @@ class Model:
         Return True if the move is successful, else False
 
         '''
-        pile = self.tableau[k]
-        hole = self.hole
-        try:
-            if not self.canMove(k):
-                return False
-            hole.append(pile.pop())
-            self.undoStack.append(k)
-            return True
-        except IndexError:
+        if not self.canMove(k):
             return False
+        self.sink(self.take(k))
+        self.undoStack.append(k)
+        # keep the moves to redo only if this was the next of them
+        if self.redoStack and self.redoStack[-1] == k:
+            self.redoStack.pop()
+        else:
+            self.redoStack = []
+        return True
         
+    def place(self, heights, hole):
+        '''
+        Set up the tableau with heights[k] cards of the deal on pile k
+        and the hole holding the cards in hole, and rebuild the indexes
+        '''
+        deck = self.deck
+        self.heights[:] = bytes(heights)
+        for piles in self.exposed:
+            piles.clear()
+        self.location.clear()
+        for k, pile in enumerate(self.tableau):
+            pile[:] = deck[k+1:k+1+17*heights[k]:17]
+            if pile:
+                self.exposed[pile[-1].rank].add(k)
+            for depth, card in enumerate(pile):
+                self.location[card.code] = (k, depth)
+        self.hole[:] = hole
+        for depth, card in enumerate(hole):
+            self.location[card.code] = (HOLE, depth)
+
+    def take(self, k):
+        '''
+        Pop the top card of tableau[k], keeping self.exposed up to date
+        '''
+        pile = self.tableau[k]
+        card = pile.pop()
+        self.heights[k] -= 1
+        self.exposed[card.rank].discard(k)
+        if pile:
+            self.exposed[pile[-1].rank].add(k)
+        return card
+
+    def put(self, k, card):
+        '''
+        Push card onto tableau[k], keeping self.exposed up to date
+        '''
+        pile = self.tableau[k]
+        if pile:
+            self.exposed[pile[-1].rank].discard(k)
+        pile.append(card)
+        self.heights[k] += 1
+        self.exposed[card.rank].add(k)
+        self.location[card.code] = (k, len(pile)-1)
+
+    def sink(self, card):
+        '''
+        Put card in the black hole
+        '''
+        self.hole.append(card)
+        self.location[card.code] = (HOLE, len(self.hole)-1)
+
+    def locate(self, code):
+        '''
+        (pile, depth) of the card with the given code, where pile is
+        HOLE for the black hole and depth counts from the bottom.
+        None if the card has not been dealt.
+        '''
+        return self.location.get(code)
+
     def canMove(self, k):
         '''
         Can the top card of pile k be moved to the black hole?
         '''
-        try:
-            card =  self.tableau[k][-1]
-        except IndexError:
-            return False
-        return abs(card.rank - self.hole[-1].rank)  in (1,12)
+        exposed = self.exposed
+        return any(k in exposed[r] for r in NEIGHBORS[self.hole[-1].rank])
+
+    def legalMoves(self):
+        '''
+        Piles whose top card can be moved to the black hole, in order
+        '''
+        low, high = NEIGHBORS[self.hole[-1].rank]
+        return sorted(self.exposed[low] | self.exposed[high])
         
     def blocked(self):
         if self.won(): 
             return False
-        return not any(self.canMove(k) for k in range(17)) 
+        low, high = NEIGHBORS[self.hole[-1].rank]
+        return not (self.exposed[low] or self.exposed[high])
         
     def won(self):
         return len(self.hole)==52 
@@ -154,7 +351,7 @@ class Model:
         '''
         k = self.undoStack.pop()
         self.redoStack.append(k)
-        self.tableau[k].append(self.hole.pop())
+        self.put(k, self.hole.pop())
     
     def redo(self):
         ''''
@@ -162,7 +359,7 @@ class Model:
         ''' 
         k = self.redoStack.pop()
         self.undoStack.append(k)
-        self.hole.append(self.tableau[k].pop())        
+        self.sink(self.take(k))
             
     def canUndo(self):
         return self.undoStack != []
@@ -171,50 +368,450 @@ class Model:
         return self.redoStack != []  
 
     def restart(self):
-        while self.canUndo():
-            self.undo()
-            
+        self.jumpTo(0)
+
+    def position(self):
+        '''
+        Number of moves made, counting from the deal
+        '''
+        return len(self.undoStack)
+
+    def length(self):
+        '''
+        Number of moves that can be undone or redone in all
+        '''
+        return len(self.undoStack) + len(self.redoStack)
+
+    def line(self):
+        '''
+        The moves made followed by the moves that can be redone
+        '''
+        return self.undoStack + self.redoStack[::-1]
+
+    def timeline(self):
+        '''
+        (line, heights, moved): heights[i] is the pile heights after
+        i moves of the line, as bytes, and moved[i] the card moved by
+        move i.  Worked out with integers alone, once per line.
+        '''
+        line = self.line()
+        if self.marks is None or self.marks[0] != line:
+            heights = bytearray([3]*17)
+            marks, moved = [bytes(heights)], []
+            for k in line:
+                heights[k] -= 1
+                marks.append(bytes(heights))
+                moved.append(self.deck[k+1+17*heights[k]])
+            self.marks = (line, marks, moved)
+        return self.marks
+
+    def jumpTo(self, n):
+        '''
+        Go to the position after n moves of the line, leaving the rest
+        to be redone.  The tableau is set up directly from the heights
+        at that move rather than by undoing or redoing move by move.
+        '''
+        line, marks, moved = self.timeline()
+        n = max(0, min(n, len(line)))
+        self.undoStack = line[:n]
+        self.redoStack = line[n:][::-1]
+        self.place(marks[n], self.deck[:1] + moved[:n])
+
+    def snapshot(self):
+        '''
+        The position as bytes: the pile heights and then the moves made
+        '''
+        return bytes(self.heights) + bytes(self.undoStack)
+
+    def restore(self, snapshot):
+        '''
+        Go back to a position from snapshot() of this deal.  The moves
+        to redo are kept if the position is on the current line.
+        '''
+        moves = list(snapshot[17:])
+        line = self.line()
+        if line[:len(moves)] == moves:
+            self.jumpTo(len(moves))
+            return
+        hole = self.deck[:1]
+        heights = bytearray([3]*17)
+        for k in moves:
+            heights[k] -= 1
+            hole.append(self.deck[k+1+17*heights[k]])
+        self.undoStack = moves
+        self.redoStack = []
+        self.place(snapshot[:17], hole)
+
+    def fork(self):
+        '''
+        A State for the current position, to try moves on
+        '''
+        return State(self.dealIds, self.heights, self.undoStack)
+
     def boardString(self):
-        board = 'Foundations: AS\n'
+        '''
+        The current position in the solver's format.  An empty pile
+        is an empty line.
+        '''
+        board = 'Foundations: %s\n' % self.hole[-1].code
         for t in self.tableau:
-            board += '%s %s %s\n'%(t[0].code,t[1].code,t[2].code)
+            board += ' '.join(card.code for card in t) + '\n'
         return board
+
+    def follows(self, moves):
+        '''
+        Did the moves made so far begin with moves?
+        '''
+        return self.undoStack[:len(moves)] == moves
     
-    def solve(self):
-        try:
-            self.solverProc.kill()
-        except:
-            pass
+    def solverArgs(self):
+        '''
+        Command line that runs the solver for the selected backend
+        '''
+        if self.backend == 'binary':
+            args = [os.path.join(self.runDir,'black-hole-solve')]
+        else:
+            args = [sys.executable, '-m', 'solver']
+        args += ['--game', 'black_hole', '--rank-reach-prune', '--max-iters', str(MAX_ITERS),
+                 '--iters-display-step', str(DISPLAY_STEP)]
+        return args
+
+    def startPool(self, size=None):
+        '''
+        Start a pool of solver workers, one per core by default.
+        The Python backend solves in the pool rather than starting
+        a process for every deal.
+        '''
+        if self.pool is None:
+            self.pool = SolverPool(size, SOLVER_MEMORY, SOLVER_TIMEOUT)
+
+    def openCache(self, filename=DEFAULT_CACHE):
+        '''
+        Look up and record solutions in a persistent cache
+        '''
+        if self.cache is None:
+            self.cache = SolutionCache(filename)
+
+    def cached(self, board):
+        '''
+        A CachedSolve for board if the cache has its answer, else None
+        '''
+        if self.cache is None:
+            return None
+        hit = self.cache.get(boardKey(board))
+        if hit is None:
+            return None
+        return CachedSolve(*hit)
+
+    def settled(self, board):
+        '''
+        A CachedSolve for board if it is settled without a full search:
+        the cache has its answer, the prefilter shows it has none or a
+        beam search (see solver/beam.py) solves it.  Else None.
+        '''
+        hit = self.cached(board)
+        if hit is not None:
+            return hit
+        start = time.time()
+        piles, hole = parseBoard(board)
+        rule = prefilter.check(piles, hole)
+        if rule is not None:
+            stats = {'checked': 0, 'iterations': 0, 'wall': time.time() - start, 'flags': rule}
+            return CachedSolve('unsolved', None, 'prefilter', stats)
+        start = time.time()
+        status, moves, checked = beam.solve(piles, hole)
+        if status == 'intractable':
+            return None
+        if self.cache is not None:
+            self.cache.put(boardKey(board), status, moves)
+        stats = {'checked': checked, 'iterations': checked, 'wall': time.time() - start,
+                 'flags': '--width %d' % beam.WIDTH}
+        return CachedSolve(status, moves, 'beam', stats)
+
+    def openLog(self, filename=DEFAULT_LOG):
+        '''
+        Log every solve, with its measurements, to a SolveLog
+        '''
+        if self.log is None:
+            self.log = SolveLog(filename)
+
+    def track(self, proc, board, source='gui'):
+        '''
+        Cache the answer of a solve and log it once it has finished
+        (see collect).  Returns proc.
+        '''
+        self.tracked[id(proc)] = (proc, board, source)
+        self.collect()
+        return proc
+
+    def record(self, proc, board, source):
+        '''
+        Cache and log a finished solve, once.  A cancelled solve is not
+        logged, since it was not finished.
+        '''
+        jobId = getattr(proc, 'id', None)
+        if jobId is not None:
+            if jobId in self.logged:
+                return
+            self.logged.add(jobId)
+        if getattr(proc, 'result', None) == 'cancelled':
+            return
+        if getattr(proc, 'killed', False) and not proc.timedOut:
+            return
+        status = proc.status()
+        if (self.cache is not None and not isinstance(proc, CachedSolve) and
+                status in ('solved', 'unsolved')):
+            self.cache.put(boardKey(board), status, proc.moves)
+        if self.log is not None:
+            entry = proc.stats()
+            entry.update(source=source, key=boardKey(board), status=status,
+                         backend=getattr(proc, 'backend', self.backend))
+            if getattr(proc, 'finished', None) is not None:
+                entry['time'] = proc.finished
+            self.log.add(entry)
+
+    def stopSolver(self):
+        '''
+        Stop the solver, if it is still running
+        '''
+        if self.solverProc is not None:
+            self.solverProc.cancel()
+
+    def shutdown(self):
+        self.collect()
+        self.stopSolver()
+        while self.upcoming:
+            deck, job = self.upcoming.popleft()
+            job.cancel()
+        self.finishing = []          # the pool stops them, keeping their checkpoints
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    def solve(self, quick=False):
+        '''
+        Start solving the current position.  If quick is true, first
+        try a short search in process, which is enough for most
+        positions late in a game.  A solve in the pool starts with the
+        first of BUDGETS and escalates (see readSolution).
+        '''
+        self.stopSolver()
         self.board = self.boardString()
-        cmd = os.path.join(self.parent.runDir,'black-hole-solve')
-        args = 'echo '+'"'+self.board+'"' ' | ' +cmd+ ' '
-        args += '--game black_hole --rank-reach-prune --max-iters 75000000'
-        self.solverProc = subprocess.Popen(args, universal_newlines=True, 
-                                           stdout=subprocess.PIPE, shell=True)
-        
+        self.solveFrom = list(self.undoStack)
+        self.speculative = False
+        hit = self.settled(self.board)
+        if hit is None and quick:
+            hit = self.quickSolve(self.board)
+        if hit is not None:
+            proc = hit
+        elif self.backend == 'python' and self.pool is not None:
+            self.budget = 0
+            proc = self.submit(self.board, BUDGETS[0])
+        else:
+            proc = SolverProcess(self.solverArgs(), self.board,
+                                 SOLVER_TIMEOUT, SOLVER_MEMORY, self.runDir)
+        self.solverProc = self.track(proc, self.board)
+
+    def submit(self, board, budget):
+        '''
+        Solve board in the pool.  With the first budget the configurations
+        of the solver are raced against each other if the pool has more
+        than one worker; the later budgets go on from the checkpoint of
+        the first configuration, which is the default one.
+        '''
+        filename = checkpoint.path(board)
+        if self.portfolio and self.pool.size > 1 and budget == BUDGETS[0]:
+            return self.pool.race(board, maxIters=budget, checkpoint=filename)
+        store = (RUNG_RAM, SPILL_DIR) if budget == BUDGETS[-1] else None
+        return self.pool.submit(board, budget, checkpoint=filename, store=store)
+
+    def quickSolve(self, board):
+        '''
+        A CachedSolve for board if a search of QUICK_ITERS iterations
+        settles it, else None
+        '''
+        start = time.time()
+        cpu = time.process_time()
+        search = Search(*parseBoard(board))
+        status = search.run(QUICK_ITERS)
+        if status not in ('solved', 'unsolved'):
+            return None
+        if self.cache is not None:
+            self.cache.put(boardKey(board), status, search.moves)
+        stats = {'checked': search.iterations, 'iterations': search.iterations,
+                 'generated': search.generated(), 'wall': time.time() - start,
+                 'cpu': time.process_time() - cpu,
+                 'flags': '--rank-reach-prune --max-iters %d' % QUICK_ITERS}
+        return CachedSolve(status, search.moves, 'quick', stats)
+
+    def presolve(self):
+        '''
+        Keep presolveDeals shuffled decks being solved in the background,
+        with a small iteration budget, ready for the next deals.
+        '''
+        if self.pool is None or self.backend != 'python':
+            return
+        while len(self.upcoming) < self.presolveDeals:
+            deck = self.deck[:1] + random.sample(self.deck[1:], 51)
+            board = deckString(deck)
+            job = self.settled(board)
+            if job is None:
+                job = self.pool.submit(board, PRESOLVE_ITERS, priority=PRESOLVE_PRIORITY)
+            self.upcoming.append((deck, self.track(job, board, 'presolve')))
+
+    def escalate(self):
+        '''
+        The pool job for the current board ran out of budget.  Run the
+        search on with the next budget, or once the last is spent leave
+        it to finish in the background.  Returns True if the solve goes
+        on, or has been answered in the background meanwhile.
+        '''
+        proc = self.solverProc
+        if getattr(proc, 'checkpoint', None) is None:
+            return False        # not a pool job
+        if proc.result != 'intractable':
+            return False        # cancelled or timed out
+        if proc.generated is None:
+            # out of memory: go on from its last checkpoint with a store that spills
+            self.finishLater(self.board, proc.checkpoint)
+            return False
+        if self.budget + 1 < len(BUDGETS):
+            self.budget += 1
+            self.solverProc = self.track(self.submit(self.board, BUDGETS[self.budget]),
+                                         self.board)
+            return True
+        self.collect()
+        hit = self.cached(self.board)
+        if hit is not None:
+            self.solverProc = self.track(hit, self.board)
+            return True
+        self.finishLater(self.board, proc.checkpoint)
+        return False
+
+    def finishLater(self, board, filename):
+        '''
+        Finish the search saved in filename with no budget, when the
+        pool has nothing better to do.  Its visited states are kept in a
+        StateTable, which spills to disk rather than running out of memory.
+        The checkpoint moves to checkpoint.BACKGROUND_DIR, where a later
+        session finds it.
+        '''
+        if self.pool is None or self.cache is None:
+            return
+        background = checkpoint.path(board, checkpoint.BACKGROUND_DIR)
+        if any(job.checkpoint == background for job in self.finishing):
+            return
+        if filename != background and os.path.exists(filename):
+            os.makedirs(checkpoint.BACKGROUND_DIR, exist_ok=True)
+            os.replace(filename, background)
+        filename = background
+        job = self.pool.submit(board, None, priority=FINISH_PRIORITY, checkpoint=filename,
+                               store=(FINISH_RAM, SPILL_DIR))
+        self.finishing.append(self.track(job, board, 'background'))
+
+    def resumeSearches(self):
+        '''
+        Finish the searches left in the background by earlier sessions.
+        The checkpoints of solves that were not (those of a session that
+        ended without shutting down) are dropped.
+        '''
+        checkpoint.cleanup(checkpoint.DEFAULT_DIR)
+        checkpoint.cleanup(checkpoint.BACKGROUND_DIR)
+        for filename, head in checkpoint.listAll(checkpoint.DEFAULT_DIR):
+            checkpoint.discard(filename)
+        for filename, head in checkpoint.listAll(checkpoint.BACKGROUND_DIR):
+            if self.cache is not None and self.cache.get(head['key'], touch=False):
+                checkpoint.discard(filename)
+            else:
+                self.finishLater(head['board'], filename)
+
+    def collect(self):
+        '''
+        Cache and log every tracked solve that has finished, whether
+        or not its answer was asked for
+        '''
+        for key, (proc, board, source) in list(self.tracked.items()):
+            if proc.status() != 'running':
+                del self.tracked[key]
+                self.record(proc, board, source)
+        for job in list(self.finishing):
+            if job.status() != 'running':
+                self.finishing.remove(job)
+                if job.result == 'intractable':
+                    checkpoint.discard(job.checkpoint)    # out of memory; it cannot go on
+
+    def searchingOn(self):
+        '''
+        Is the search for the current board going on in the background?
+        '''
+        return any(job.board == self.board and job.status() == 'running'
+                   for job in self.finishing)
+
+    def adopt(self, job):
+        '''
+        Take over the solve of a deal that was started ahead of time,
+        moving it to the front of the pool's queue if it has not finished.
+        '''
+        self.stopSolver()
+        self.board = self.boardString()
+        self.solveFrom = []
+        self.solverProc = job
+        if not isinstance(job, CachedSolve):
+            self.speculative = True
+            job.promote()
+
+    def solverProgress(self):
+        '''
+        Number of positions the solver has examined so far
+        '''
+        if self.solverProc is None:
+            return 0
+        return self.solverProc.progress()
+
     def readSolution(self):
+        '''
+        Solve the current position.  Returns 'solved', with the rest of
+        the solution on the redo stack, 'unsolved', 'intractable', or
+        'running' if the answer is not in yet.
+
+        The answer for an earlier position is used if the moves made
+        since then follow its solution, or if it has none; otherwise
+        the current position is solved afresh.  A search that runs out
+        of budget goes on with the next, and after the last is finished
+        in the background, its answer going to the cache.
+        '''
         proc = self.solverProc
-        status = proc.poll()
-        if status == None:
+        status = proc.status()
+        if status == 'intractable' and self.speculative:
+            # Only the budget for solving ahead ran out
+            self.solve()
             return 'running'
-        if status == 255:
-            return 'unsolved'
-        if status == 254:
-            return 'intractable'
-        if not self.solved:
-            out = proc.stdout.read()
-            pattern=self.solnPattern
-            self.soln = [int(s) for s in pattern.findall(out)]
-            self.solved = True
-        for t in self.tableau:
-            t.clear()
-        self.deal(False)
-        self.undoStack = []
-        self.redoStack = list(reversed(self.soln)) 
-        return ('solved')
+        if status == 'intractable' and self.undoStack == self.solveFrom and self.escalate():
+            return self.readSolution()
+        if status != 'running':
+            self.collect()
+        if status == 'solved':
+            line = self.solveFrom + list(proc.moves)
+            if line[:len(self.undoStack)] == self.undoStack:
+                self.redoStack = list(reversed(line[len(self.undoStack):]))
+                return status
+        if status == 'unsolved' and self.follows(self.solveFrom):
+            return status
+        if self.undoStack == self.solveFrom:
+            return status
+        self.solve(True)
+        if self.solverProc.status() == 'running':
+            return 'running'
+        return self.readSolution()
     
     def saveGame(self):
-        dirname = os.path.join(self.parent.runDir,'savedGames')
+        dirname = os.path.join(self.runDir,'savedGames')
         length = 1+len([f for f in os.listdir(dirname) if f.startswith('board')])
         name = 'board%d.txt'%length
         filename = os.path.join(dirname, name)
@@ -0,0 +1,8 @@
+'''
+Black hole solver.
+
+solve(board) takes a board in the text format produced by
+Model.boardString() and returns the list of piles to move from,
+UNSOLVED or INTRACTABLE.
+'''
+from .engine import solve, parseBoard, Search, SOLVED, UNSOLVED, INTRACTABLE
@@ -0,0 +1,108 @@
+# __main__.py Command line interface to the black hole solver
+'''
+A drop in replacement for black-hole-solve.  It reads the same board
+format, accepts the same options and writes the same output, so
+
+    python -m solver --game black_hole --rank-reach-prune board.txt
+
+can be used anywhere the compiled solver was.  Exit status is 0 if the
+board is solved, 255 if it has no solution and 254 if the iteration
+limit was reached first.  --order and --seed choose the move ordering
+(see engine.Search), --max-ram and --spill keep the positions seen in
+a store.StateTable and --workers searches on several cores (see
+parallel.py, for its limits); black-hole-solve has none of these.
+'''
+import sys
+import argparse
+from .engine import Search, parseBoard, SOLVED, UNSOLVED, INTRACTABLE, ORDERS
+from .store import StateTable
+from .parallel import ParallelSearch
+
+EXIT_CODES = {SOLVED: 0, UNSOLVED: 255, INTRACTABLE: 254}
+
+def boardText(piles, hole):
+    '''
+    The board reached after the moves made so far, in input format
+    '''
+    lines = ['Foundations: %s' % hole]
+    lines += [' '.join(p) for p in piles]
+    return '\n'.join(lines) + '\n'
+
+def report(search, displayBoards, out):
+    status = search.status
+    if status == SOLVED:
+        out.write('Solved!\n')
+        piles = [list(p) for p in search.codes]
+        for k in search.moves:
+            card = piles[k].pop()
+            out.write('Move a card from stack %d to the foundations\n\n' % k)
+            out.write('Info: Card moved is %s\n\n' % card)
+            if displayBoards:
+                out.write('[START BOARD]\n%s[END BOARD]\n' % boardText(piles, card))
+            out.write('\n====================\n\n')
+    elif status == INTRACTABLE:
+        out.write('Intractable!\n')
+    else:
+        out.write('Unsolved!\n')
+    out.write('\n\n--------------------\n')
+    out.write('Total number of states checked is %d.\n' % search.iterations)
+    out.write('This scan generated %d states.\n' % search.generated())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solver',
+                                     description='Solve a Black Hole solitaire board.')
+    parser.add_argument('--game', required=True, choices=['black_hole'])
+    parser.add_argument('--max-iters', type=int, default=None)
+    parser.add_argument('--rank-reach-prune', action='store_true')
+    parser.add_argument('--order', choices=ORDERS, default='counts')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--max-ram', type=int, metavar='MB',
+                        help='memory for the positions seen, in megabytes')
+    parser.add_argument('--spill', metavar='DIR',
+                        help='directory for positions seen past --max-ram')
+    parser.add_argument('--workers', type=int, metavar='N',
+                        help='search with N processes')
+    parser.add_argument('--display-boards', action='store_true')
+    parser.add_argument('--iters-display-step', type=int, default=0)
+    parser.add_argument('board', nargs='?', help='board file (default stdin)')
+    args = parser.parse_args(argv)
+    if args.iters_display_step < 0:
+        parser.error('--iters-display-step should be positive or zero.')
+    if args.workers is not None and (args.max_ram is not None or args.spill is not None):
+        parser.error('--workers cannot be used with --max-ram or --spill.')
+    if args.board:
+        with open(args.board) as fin:
+            text = fin.read()
+    else:
+        text = sys.stdin.read()
+    try:
+        piles, hole = parseBoard(text)
+    except ValueError as e:
+        sys.stderr.write('Error reading the board: %s\n' % e)
+        return 1
+    out = sys.stdout
+
+    def trace(search):
+        out.write('Iteration: %d\n' % search.iterations)
+        out.flush()
+
+    if args.workers is not None:
+        search = ParallelSearch(piles, hole, args.rank_reach_prune, args.order, args.seed,
+                                args.workers)
+    else:
+        visited = None
+        if args.max_ram is not None or args.spill is not None:
+            maxBytes = args.max_ram << 20 if args.max_ram is not None else None
+            visited = StateTable(maxBytes, args.spill)
+        search = Search(piles, hole, args.rank_reach_prune, args.order, args.seed,
+                        visited=visited)
+    try:
+        search.run(args.max_iters, args.iters_display_step, trace)
+    except MemoryError:
+        search.status = INTRACTABLE
+    report(search, args.display_boards, out)
+    out.flush()
+    return EXIT_CODES[search.status]
+
+if __name__ == '__main__':
+    sys.exit(main())
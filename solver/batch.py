@@ -0,0 +1,303 @@
+# batch.py Solve a range of PySol deals
+'''
+Solve PySol Black Hole deals first to last across a pool of processes
+and record the results in the bhs_runs table of an SQLite database
+(test/bhs.db by default, which is where sortdb.py looks):
+
+    python -m solver.batch 1 1000000 --jobs 8
+
+Results are committed in batches, and deals already in the table are
+skipped, so a run that is interrupted can simply be started again.
+Status is 'S' (solved), 'U' (unsolved) or 'I' (intractable).
+
+Deals whose rank pattern is in the solution cache are not searched
+(they are recorded with no states checked), and new answers are added
+to the cache.  Every solve is also logged, with its CPU time and, on
+Linux, its peak memory, to the log of solves (see records.py).
+
+Deals that prefilter.py shows to be unsolvable are recorded without a
+search, and the number eliminated by each of its rules is reported.
+The rest are first tried with a beam search (beam.py), and searched in
+full only if that fails.  The run ends with the share of the deals
+settled by each tier: the cache, the prefilter, the beam and the search.
+
+With --portfolio N each deal is solved by racing N configurations of
+the solver on the workers (see pool.SolverPool.race), which settles
+more of the hard deals for the same budget, at the cost of throughput.
+'''
+import os
+import sys
+import time
+import sqlite3
+import queue
+import argparse
+import collections
+import multiprocessing
+from . import deals
+from .engine import Search, parseBoard, SOLVED, UNSOLVED, INTRACTABLE
+from .cache import SolutionCache, boardKey, DEFAULT_CACHE
+from .records import SolveLog, DEFAULT_LOG, resetPeak, jobPeakRSS
+from .pool import SolverPool, PORTFOLIO
+from . import prefilter, beam
+
+STATUS_CODES = {SOLVED: 'S', UNSOLVED: 'U', INTRACTABLE: 'I'}
+STATUSES = {code: status for status, code in STATUS_CODES.items()}
+TIERS = [('cache', 'cache'), ('prefilter', 'prefilter'), ('beam', 'beam'),
+         ('python', 'search')]          # (backend, name in the report)
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test', 'bhs.db')
+MAX_ITERS = 10000000
+BATCH_SIZE = 500             # results per transaction
+
+COLUMNS = [('idx', 'INTEGER PRIMARY KEY'),
+           ('status', 'TEXT'),
+           ('num_checked', 'INTEGER'),
+           ('num_generated', 'INTEGER'),
+           ('wall_time', 'REAL'),
+           ('moves', 'TEXT')]
+
+def openDatabase(filename):
+    '''
+    Open the results database, creating the table or adding any
+    columns missing from an older table.
+    '''
+    dirname = os.path.dirname(filename)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    conn = sqlite3.connect(filename)
+    conn.execute('CREATE TABLE IF NOT EXISTS bhs_runs (%s)' %
+                 ', '.join('%s %s' % c for c in COLUMNS))
+    present = {row[1] for row in conn.execute('PRAGMA table_info(bhs_runs)')}
+    for name, kind in COLUMNS:
+        if name not in present:
+            conn.execute('ALTER TABLE bhs_runs ADD COLUMN %s %s' % (name, kind.split()[0]))
+    conn.commit()
+    return conn
+
+def recorded(conn, first, last):
+    '''
+    Deal numbers in first..last that already have results
+    '''
+    cursor = conn.execute('SELECT idx FROM bhs_runs WHERE idx BETWEEN ? AND ?', (first, last))
+    return {row[0] for row in cursor}
+
+workerCache = None           # each worker's read only connection to the cache
+
+def initWorker(cacheFile):
+    global workerCache
+    if cacheFile is not None:
+        workerCache = SolutionCache(cacheFile)
+
+def solveDeal(task):
+    '''
+    Solve one deal (run in a worker process).  Returns the row for
+    bhs_runs, the deal's rank pattern and the entry for the log.
+    '''
+    n, pysolFC, maxIters, screen = task
+    measured = resetPeak()
+    start = time.time()
+    cpu = time.process_time()
+    board = deals.board(n, pysolFC)
+    key = boardKey(board)
+    hit = workerCache.get(key, touch=False) if workerCache is not None else None
+    if hit is not None:
+        return cachedResult(n, key, hit, start)
+    piles, hole = parseBoard(board)
+    rule = prefilter.check(piles, hole) if screen else None
+    if rule is not None:
+        return deadResult(n, key, rule, start)
+    result = beamResult(n, key, piles, hole, start)
+    if result is not None:
+        return result
+    search = Search(piles, hole)
+    try:
+        status = search.run(maxIters)
+    except MemoryError:
+        status = INTRACTABLE
+    moves = ' '.join(str(k) for k in search.moves) if status == SOLVED else None
+    wall = time.time() - start
+    entry = {'backend': 'python', 'flags': '--rank-reach-prune --max-iters %d' % maxIters,
+             'checked': search.iterations, 'generated': search.generated(),
+             'iterations': search.iterations, 'wall': wall, 'cpu': time.process_time() - cpu}
+    if measured:
+        entry['rss'] = jobPeakRSS()
+    return (n, STATUS_CODES[status], search.iterations, search.generated(), wall, moves), key, entry
+
+def cachedResult(n, key, hit, start):
+    '''
+    solveDeal's result for a deal answered from the cache
+    '''
+    status, moves = hit
+    moves = ' '.join(str(k) for k in moves) if moves else None
+    wall = time.time() - start
+    return ((n, STATUS_CODES[status], 0, 0, wall, moves), key,
+            {'backend': 'cache', 'checked': 0, 'iterations': 0, 'wall': wall})
+
+def deadResult(n, key, rule, start):
+    '''
+    solveDeal's result for a deal the prefilter showed to be unsolvable
+    '''
+    wall = time.time() - start
+    return ((n, STATUS_CODES[UNSOLVED], 0, 0, wall, None), key,
+            {'backend': 'prefilter', 'flags': rule, 'rule': rule,
+             'checked': 0, 'iterations': 0, 'wall': wall})
+
+def beamResult(n, key, piles, hole, start):
+    '''
+    solveDeal's result for a deal the beam search settles, else None
+    '''
+    status, moves, checked = beam.solve(piles, hole)
+    if status == INTRACTABLE:
+        return None
+    moves = ' '.join(str(k) for k in moves) if moves else None
+    wall = time.time() - start
+    return ((n, STATUS_CODES[status], checked, checked, wall, moves), key,
+            {'backend': 'beam', 'flags': '--width %d' % beam.WIDTH,
+             'checked': checked, 'iterations': checked, 'wall': wall})
+
+def raceDeals(tasks, jobs, configs, cache):
+    '''
+    Solve each deal by racing configs on a SolverPool, with a race for
+    each worker under way at a time.  Yields the same results as
+    solveDeal, in the order the races finish.
+    '''
+    pool = SolverPool(jobs)
+    finished = queue.Queue()
+    waiting = collections.deque(tasks)
+    running = {}
+    try:
+        while waiting or running:
+            while waiting and len(running) < pool.size:
+                n, pysolFC, maxIters, screen = waiting.popleft()
+                start = time.time()
+                board = deals.board(n, pysolFC)
+                key = boardKey(board)
+                hit = cache.get(key, touch=False) if cache is not None else None
+                if hit is not None:
+                    yield cachedResult(n, key, hit, start)
+                    continue
+                piles, hole = parseBoard(board)
+                rule = prefilter.check(piles, hole) if screen else None
+                if rule is not None:
+                    yield deadResult(n, key, rule, start)
+                    continue
+                result = beamResult(n, key, piles, hole, start)
+                if result is not None:
+                    yield result
+                    continue
+                race = pool.race(board, configs, maxIters, notify=finished)
+                running[race] = (n, key, start)
+            if not running:
+                continue
+            race = finished.get()
+            n, key, start = running.pop(race)
+            status = race.status()
+            moves = ' '.join(str(k) for k in race.moves) if status == SOLVED else None
+            entry = race.stats()
+            entry['backend'] = 'python'
+            yield ((n, STATUS_CODES[status], race.iterations, race.generated or 0,
+                    time.time() - start, moves), key, entry)
+    finally:
+        pool.shutdown()
+
+def save(conn, rows, cache=None, keys=None, log=None, entries=None):
+    with conn:
+        conn.executemany('INSERT OR REPLACE INTO bhs_runs '
+                         '(idx, status, num_checked, num_generated, wall_time, moves) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', rows)
+    if cache is not None:
+        cache.putMany([(key, STATUSES[row[1]], row[5] and [int(k) for k in row[5].split()])
+                       for row, key in zip(rows, keys) if row[2]])     # not cache hits
+    if log is not None:
+        for row, key, entry in zip(rows, keys, entries):
+            entry.update(source='batch', deal=row[0], key=key, status=STATUSES[row[1]])
+        log.addMany(entries)
+
+def run(first, last, dbName=DEFAULT_DB, jobs=None, maxIters=MAX_ITERS, pysolFC=True,
+        cacheFile=DEFAULT_CACHE, logFile=DEFAULT_LOG, portfolio=None, screen=True,
+        out=sys.stdout):
+    conn = openDatabase(dbName)
+    cache = SolutionCache(cacheFile) if cacheFile is not None else None
+    log = SolveLog(logFile) if logFile is not None else None
+    done = recorded(conn, first, last)
+    tasks = [(n, pysolFC, maxIters, screen) for n in range(first, last+1) if n not in done]
+    out.write('%d deals to solve, %d already recorded\n' % (len(tasks), len(done)))
+    counts = dict.fromkeys(STATUS_CODES.values(), 0)
+    rules = collections.Counter()    # deals eliminated by each prefilter rule
+    tiers = collections.Counter()    # deals settled by each backend
+    rows, keys, entries = [], [], []
+    start = time.time()
+    if portfolio:
+        pool = None
+        results = raceDeals(tasks, jobs, PORTFOLIO[:portfolio], cache)
+    else:
+        pool = multiprocessing.Pool(jobs, initWorker, (cacheFile,))
+        results = pool.imap_unordered(solveDeal, tasks, chunksize=8)
+    try:
+        for row, key, entry in results:
+            rows.append(row)
+            keys.append(key)
+            entries.append(entry)
+            counts[row[1]] += 1
+            tiers[entry['backend']] += 1
+            if 'rule' in entry:
+                rules[entry['rule']] += 1
+            if len(rows) >= BATCH_SIZE:
+                save(conn, rows, cache, keys, log, entries)
+                rows, keys, entries = [], [], []
+                out.write('%d done  S %d  U %d  I %d  %.0fs\n' %
+                          (sum(counts.values()), counts['S'], counts['U'], counts['I'],
+                           time.time() - start))
+                out.flush()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    save(conn, rows, cache, keys, log, entries)
+    conn.close()
+    if cache is not None:
+        cache.close()
+    if log is not None:
+        log.close()
+    out.write('Finished: S %d  U %d  I %d  in %.0fs\n' %
+              (counts['S'], counts['U'], counts['I'], time.time() - start))
+    if screen:
+        out.write('Prefilter: %d of the unsolved  %s\n' %
+                  (sum(rules.values()), '  '.join('%s %d' % (rule, rules[rule])
+                                                  for rule in prefilter.RULES)))
+    total = sum(tiers.values()) or 1
+    out.write('Tiers: %s\n' % '  '.join('%s %d (%.1f%%)' % (name, tiers[backend],
+                                                           100.0 * tiers[backend] / total)
+                                       for backend, name in TIERS))
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solver.batch',
+                                     description='Solve a range of PySol Black Hole deals.')
+    parser.add_argument('first', type=int)
+    parser.add_argument('last', type=int)
+    parser.add_argument('--db', default=DEFAULT_DB, help='results database')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default one per core)')
+    parser.add_argument('--max-iters', type=int, default=MAX_ITERS)
+    parser.add_argument('--pysol', action='store_true',
+                        help='deal as PySol rather than PySolFC (make_pysol_board.py without -F)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help='solution cache')
+    parser.add_argument('--no-cache', action='store_true', help='do not use the solution cache')
+    parser.add_argument('--log', default=DEFAULT_LOG, help='log of solves')
+    parser.add_argument('--no-log', action='store_true', help='do not log the solves')
+    parser.add_argument('--no-prefilter', action='store_true',
+                        help='search every deal, even those the prefilter rules out')
+    parser.add_argument('--portfolio', type=int, metavar='N',
+                        help='race N solver configurations on each deal (at most %d)' %
+                        len(PORTFOLIO))
+    args = parser.parse_args(argv)
+    if not 1 <= args.first <= args.last <= deals.MAX_DEAL:
+        parser.error('deal numbers must satisfy 1 <= first <= last <= %d' % deals.MAX_DEAL)
+    cacheFile = None if args.no_cache else args.cache
+    if args.portfolio is not None and not 1 <= args.portfolio <= len(PORTFOLIO):
+        parser.error('--portfolio must be from 1 to %d' % len(PORTFOLIO))
+    logFile = None if args.no_log else args.log
+    run(args.first, args.last, args.db, args.jobs, args.max_iters, not args.pysol, cacheFile,
+        logFile, args.portfolio, not args.no_prefilter)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# beam.py Quick solving by beam search
+'''
+Most deals that can be won are won by many lines of play, and a search
+that keeps only the most promising few positions at each move finds
+one in a few milliseconds, often on deals that take the depth first
+search (engine.py) hundreds of thousands of iterations.  So every board
+the prefilter passes is first given to solve() here, and only searched
+in full if it fails.
+
+The beam holds at most width positions after each number of moves.
+All the moves from them are made, and the width best of the new
+positions are kept, best by this score, lowest first:
+
+    the sum of the squares of the pile heights (so cards come off the
+    tallest piles, leaving no pile to bury the cards it holds), less
+    COUNT_WEIGHT times the number of cards left of the rank just moved
+    to the hole (so a rank with cards to spare goes to the hole rather
+    than one whose last cards are needed to bridge to others)
+
+A beam that never had to drop a position has looked at every line of
+play, so if it finds no solution the board has none.
+'''
+from .engine import Search, parseBoard, CONNECTED, SOLVED, UNSOLVED, INTRACTABLE
+
+WIDTH = 16
+COUNT_WEIGHT = 6
+
+def solve(piles, hole, width=WIDTH):
+    '''
+    Beam search the board (as from parseBoard).  Returns (status, moves,
+    checked): SOLVED with the piles to move from, UNSOLVED if the beam
+    was never full, else INTRACTABLE, and the positions looked at.
+    '''
+    search = Search(piles, hole)       # for its tables and packed position
+    tops = search.tops
+    adjacent = search.adjacent
+    delta = search.delta
+    piles = range(len(tops))
+    heights = tuple(search.heights)
+    # key, hole rank, heights, counts, mask, sum of squared heights, moves
+    # (the moves as nested pairs (pile, earlier moves))
+    level = [(search.key, search.rank, heights, tuple(search.counts), search.mask,
+              sum(h*h for h in heights), None)]
+    seen = set()
+    checked = 0
+    full = False
+    for depth in range(search.remaining):
+        children = []
+        for key, rank, heights, counts, mask, squares, moves in level:
+            adj = adjacent[rank]
+            for i in piles:
+                h = heights[i]
+                r = tops[i][h]
+                if not adj[r]:
+                    continue
+                k = key + delta[i][h] | r
+                if k in seen:
+                    continue
+                seen.add(k)
+                checked += 1
+                c = counts[r] - 1
+                m = mask if c else mask ^ 1 << r
+                if not CONNECTED[m | 1 << r]:
+                    continue
+                children.append((squares - 2*h + 1 - COUNT_WEIGHT*c, k - r, r,
+                                 heights[:i] + (h-1,) + heights[i+1:],
+                                 counts[:r] + (c,) + counts[r+1:], m, squares - 2*h + 1,
+                                 (i, moves)))
+        if not children:
+            return UNSOLVED if not full else INTRACTABLE, None, checked
+        if len(children) > width:
+            children.sort(key=lambda child: child[0])
+            del children[width:]
+            full = True
+        level = [child[1:] for child in children]
+    solution = []
+    moves = level[0][-1]
+    while moves is not None:
+        i, moves = moves
+        solution.append(i)
+    solution.reverse()
+    return SOLVED, solution, checked
+
+def solveBoard(board, width=WIDTH):
+    return solve(*parseBoard(board), width=width)
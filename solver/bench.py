@@ -0,0 +1,246 @@
+# bench.py Benchmark the solvers on the deals in solved150.txt
+'''
+Deal the boards listed in solved150.txt (PySol deal numbers with the
+states the compiled solver checked to solve them), run each solver
+backend on each with a fixed iteration budget, and report wall time,
+states checked, states a second and peak RSS per deal and in all:
+
+    python -m solver.bench --max-iters 1000000 --json run.json
+    python -m solver.bench --baseline bench_baseline.json
+
+Every solve runs in its own process, so peak RSS is that solve's alone
+(POSIX only).  --workers N runs the Python solver with N processes
+(see parallel.py), to measure the speedup on the hardest deals:
+
+    python -m solver.bench --limit 5 --max-iters 20000000 --workers 8
+
+With --baseline the results are compared with bench_baseline.json, which
+holds only what does not depend on the machine (the status and states
+checked for each deal), and the exit status is 1 if any deal it solved
+is no longer solved or any deal checks more than --tolerance more
+states.  --write-baseline writes that file from the run.
+
+Rates depend on the machine, so they are only compared with --rates,
+given the --json file of an earlier run on the same machine; the exit
+status is then also 1 if a backend's states a second drop by more than
+--tolerance.
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from . import deals
+from .reader import OutputReader
+from .records import peakRSS
+from .engine import SOLVED, UNSOLVED, INTRACTABLE
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEALS_FILE = os.path.join(HERE, 'solved150.txt')
+BASELINE = os.path.join(HERE, 'bench_baseline.json')
+MAX_ITERS = 1000000
+TOLERANCE = 0.2
+EXIT_STATUS = {0: SOLVED, 255: UNSOLVED, 254: INTRACTABLE}
+
+def solverCommand(backend, maxIters, workers=None):
+    if backend == 'binary':
+        args = [os.path.join(os.path.dirname(HERE), 'black-hole-solve')]
+    else:
+        args = [sys.executable, '-m', 'solver']
+        if workers is not None:
+            args += ['--workers', str(workers)]
+    return args + ['--game', 'black_hole', '--rank-reach-prune', '--max-iters', str(maxIters)]
+
+def readDeals(filename, limit=None):
+    '''
+    (deal number, states checked) pairs from a file like solved150.txt
+    '''
+    pairs = []
+    with open(filename) as fin:
+        for line in fin:
+            fields = line.split()
+            if fields:
+                pairs.append((int(fields[0]), int(fields[1])))
+    return pairs[:limit]
+
+def runOne(backend, deal, board, maxIters, workers=None):
+    '''
+    Solve one board in a fresh process and measure it
+    '''
+    start = time.time()
+    try:
+        proc = subprocess.Popen(solverCommand(backend, maxIters, workers), cwd=os.path.dirname(HERE),
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, universal_newlines=True)
+    except OSError as e:
+        return {'deal': deal, 'backend': backend, 'status': 'error', 'error': str(e)}
+    reader = OutputReader(proc.stdout)
+    try:
+        proc.stdin.write(board)
+        proc.stdin.close()
+    except OSError:
+        pass
+    reader.join()
+    if hasattr(os, 'wait4'):
+        pid, code, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(code) & 0xff
+        rss = peakRSS(usage)
+    else:
+        proc.wait()
+        rss = None
+    wall = time.time() - start
+    status = reader.result or EXIT_STATUS.get(proc.returncode, 'error')
+    checked = reader.checked or 0
+    return {'deal': deal, 'backend': backend, 'status': status, 'checked': checked,
+            'wall': round(wall, 4), 'rate': round(checked / wall) if wall else 0,
+            'rss': rss}
+
+def summarize(results):
+    '''
+    Totals for each backend
+    '''
+    summary = {}
+    for r in results:
+        s = summary.setdefault(r['backend'], {'deals': 0, SOLVED: 0, UNSOLVED: 0,
+                                              INTRACTABLE: 0, 'error': 0, 'checked': 0,
+                                              'wall': 0.0, 'rss': 0})
+        s['deals'] += 1
+        s[r['status']] += 1
+        s['checked'] += r.get('checked', 0)
+        s['wall'] += r.get('wall', 0.0)
+        s['rss'] = max(s['rss'], r.get('rss') or 0)
+    for s in summary.values():
+        s['wall'] = round(s['wall'], 3)
+        s['rate'] = round(s['checked'] / s['wall']) if s['wall'] else 0
+    return summary
+
+def baselineOf(run):
+    '''
+    The machine independent part of a run, for bench_baseline.json
+    '''
+    return {'config': {'maxIters': run['config']['maxIters'],
+                       'pysolFC': run['config']['pysolFC']},
+            'results': [{'deal': r['deal'], 'backend': r['backend'], 'status': r['status'],
+                         'checked': r.get('checked', 0)} for r in run['results']]}
+
+def writeBaseline(filename, baseline):
+    '''
+    Write a baseline with a line for each deal, so changes diff well
+    '''
+    with open(filename, 'w') as fout:
+        fout.write('{"config": %s,\n "results": [\n' % json.dumps(baseline['config']))
+        fout.write(',\n'.join('  ' + json.dumps(r) for r in baseline['results']))
+        fout.write('\n]}\n')
+
+def compare(run, baseline, tolerance=TOLERANCE):
+    '''
+    Regressions of run against baseline in status and states checked,
+    as messages
+    '''
+    problems = []
+    before = {(r['backend'], r['deal']): r for r in baseline['results']}
+    for r in run['results']:
+        old = before.get((r['backend'], r['deal']))
+        if old is None:
+            continue
+        if old['status'] == SOLVED and r['status'] != SOLVED:
+            problems.append('%s deal %d: %s, was solved' % (r['backend'], r['deal'], r['status']))
+        elif (r['status'] == old['status'] and
+              r.get('checked', 0) > old.get('checked', 0) * (1 + tolerance)):
+            problems.append('%s deal %d: %d states checked, was %d' %
+                            (r['backend'], r['deal'], r['checked'], old['checked']))
+    return problems
+
+def compareRates(run, earlier, tolerance=TOLERANCE):
+    '''
+    Drops in states a second of run against an earlier run on the same
+    machine, as messages
+    '''
+    problems = []
+    for backend, s in run['summary'].items():
+        old = earlier['summary'].get(backend)
+        if old and s['rate'] < old['rate'] * (1 - tolerance):
+            problems.append('%s: %d states a second, was %d' % (backend, s['rate'], old['rate']))
+    return problems
+
+def run(dealList, backends, maxIters, pysolFC=True, workers=None, out=sys.stdout):
+    results = []
+    for deal, reference in dealList:
+        board = deals.board(deal, pysolFC)
+        for backend in backends:
+            r = runOne(backend, deal, board, maxIters, workers)
+            results.append(r)
+            out.write('%7d %-7s %-12s %10d states %8.2fs %9d/s %6.0fMB\n' %
+                      (deal, backend, r['status'], r.get('checked', 0), r.get('wall', 0),
+                       r.get('rate', 0), (r.get('rss') or 0) / 2**20))
+            out.flush()
+    return {'config': {'maxIters': maxIters, 'pysolFC': pysolFC, 'backends': backends,
+                       'workers': workers,
+                       'python': platform.python_version(), 'machine': platform.machine(),
+                       'host': platform.node(),
+                       'date': time.strftime('%Y-%m-%d %H:%M:%S')},
+            'results': results,
+            'summary': summarize(results)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solver.bench',
+                                     description='Benchmark the solvers on solved150.txt.')
+    parser.add_argument('--deals', default=DEALS_FILE, help='deal list (default solved150.txt)')
+    parser.add_argument('--limit', type=int, help='only the first LIMIT deals')
+    parser.add_argument('--backends', default='python',
+                        help='comma separated: python, binary (default python)')
+    parser.add_argument('--max-iters', type=int, default=MAX_ITERS)
+    parser.add_argument('--pysol', action='store_true', help='deal as PySol rather than PySolFC')
+    parser.add_argument('--workers', type=int, metavar='N',
+                        help='run the Python solver with N processes')
+    parser.add_argument('--json', help='write the results here')
+    parser.add_argument('--baseline', nargs='?', const=BASELINE,
+                        help='compare statuses and states checked with this baseline '
+                        '(default bench_baseline.json)')
+    parser.add_argument('--write-baseline', nargs='?', const=BASELINE, metavar='BASELINE',
+                        help='write the baseline from this run (default bench_baseline.json)')
+    parser.add_argument('--rates', metavar='JSON',
+                        help='compare states a second with this --json run on this machine')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+    backends = args.backends.split(',')
+    for backend in backends:
+        if backend not in ('python', 'binary'):
+            parser.error('unknown backend %r' % backend)
+    results = run(readDeals(args.deals, args.limit), backends, args.max_iters, not args.pysol,
+                  args.workers)
+    for backend, s in sorted(results['summary'].items()):
+        print('%s: %d deals, %d solved, %d unsolved, %d intractable, %d errors; '
+              '%d states in %.1fs, %d/s, peak %.0fMB' %
+              (backend, s['deals'], s[SOLVED], s[UNSOLVED], s[INTRACTABLE], s['error'],
+               s['checked'], s['wall'], s['rate'], s['rss'] / 2**20))
+    if args.json:
+        with open(args.json, 'w') as fout:
+            json.dump(results, fout, indent=1)
+    if args.write_baseline:
+        writeBaseline(args.write_baseline, baselineOf(results))
+    problems = []
+    if args.baseline:
+        with open(args.baseline) as fin:
+            baseline = json.load(fin)
+        if baseline['config']['maxIters'] != args.max_iters:
+            print('warning: the baseline used --max-iters %d' % baseline['config']['maxIters'])
+        problems += compare(results, baseline, args.tolerance)
+    if args.rates:
+        with open(args.rates) as fin:
+            earlier = json.load(fin)
+        if earlier['config'].get('host') != results['config']['host']:
+            print('warning: %s was run on another machine' % args.rates)
+        problems += compareRates(results, earlier, args.tolerance)
+    for problem in problems:
+        print('REGRESSION ' + problem)
+    if problems:
+        return 1
+    if args.baseline or args.rates:
+        print('no regressions')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# cache.py Remember solutions by rank pattern
+'''
+Black Hole ignores suits, so two boards whose piles hold the same
+ranks in the same places have the same solutions, move for move.
+boardKey() reduces a board to that rank pattern, and SolutionCache keeps
+the status and moves for each pattern in an SQLite file, dropping the
+least recently used entries once it holds more than maxEntries.
+
+Only definite answers (solved and unsolved) are cached; an intractable
+result just means the budget ran out.
+'''
+import os
+import time
+import sqlite3
+from .engine import parseBoard, cardRank, RANK_NAMES, SOLVED, UNSOLVED
+
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'solutions.db')
+MAX_ENTRIES = 1000000
+
+def boardKey(board):
+    '''
+    Rank pattern of a board: the rank of the hole card, then the ranks
+    of each pile from bottom to top, e.g. 'A/JTQ/37K/...'
+    '''
+    piles, hole = parseBoard(board)
+    parts = [RANK_NAMES[cardRank(hole)-1]]
+    parts += [''.join(RANK_NAMES[cardRank(c)-1] for c in p) for p in piles]
+    return '/'.join(parts)
+
+class CachedSolve:
+    '''
+    A solve answered from the cache, with the same interface as a
+    solver process or pool job.  It also stands for a search already
+    done in process, given its backend name and stats.
+    '''
+    def __init__(self, status, moves, backend='cache', stats=None):
+        self.result = status
+        self.moves = moves
+        self.iterations = 0
+        self.backend = backend
+        self.measured = stats or {'checked': 0, 'iterations': 0, 'wall': 0.0}
+
+    def status(self):
+        return self.result
+
+    def progress(self):
+        return 0
+
+    def cancel(self):
+        pass
+
+    def stats(self):
+        return dict(self.measured)
+
+class SolutionCache:
+    def __init__(self, filename=DEFAULT_CACHE, maxEntries=MAX_ENTRIES):
+        self.maxEntries = maxEntries
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS solutions '
+                          '(key TEXT PRIMARY KEY, status TEXT, moves TEXT, used REAL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)')
+        self.conn.commit()
+
+    def get(self, key, touch=True):
+        '''
+        (status, moves) for the rank pattern key, or None.  Readers in
+        other processes pass touch=False to leave the file unchanged.
+        '''
+        row = self.conn.execute('SELECT status, moves FROM solutions WHERE key = ?',
+                                (key,)).fetchone()
+        if row is None:
+            return None
+        if touch:
+            with self.conn:
+                self.conn.execute('UPDATE solutions SET used = ? WHERE key = ?', (time.time(), key))
+        status, moves = row
+        return status, [int(k) for k in moves.split()] if moves else None
+
+    def put(self, key, status, moves):
+        self.putMany([(key, status, moves)])
+
+    def putMany(self, entries):
+        '''
+        Store (key, status, moves) triples in one transaction.
+        Anything but solved or unsolved is ignored.
+        '''
+        now = time.time()
+        rows = [(key, status, ' '.join(str(k) for k in moves) if moves else None, now)
+                for key, status, moves in entries if status in (SOLVED, UNSOLVED)]
+        if not rows:
+            return
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)', rows)
+            excess = self.conn.execute('SELECT COUNT(*) FROM solutions').fetchone()[0] - self.maxEntries
+            if excess > 0:
+                self.conn.execute('DELETE FROM solutions WHERE key IN '
+                                  '(SELECT key FROM solutions ORDER BY used LIMIT ?)', (excess,))
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
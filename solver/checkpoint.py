@@ -0,0 +1,186 @@
+# checkpoint.py Save searches that ran out of budget, to resume later
+'''
+A Search keeps its whole state (the stack of untried moves, the path
+and the visited set) on the instance, so a search that runs out of
+budget can be pickled to disk and later run on with a larger budget
+from where it stopped, rather than from the start.
+
+A checkpoint file holds a small header (the board, its rank pattern and
+the iterations done), then the Search.  Files are named after the rank
+pattern, since boards with the same pattern have the same search, and
+are written to a temporary name and renamed, so a process killed while
+saving never leaves a damaged file behind (cleanup() removes the
+temporary files such a process leaves).
+
+The game keeps the checkpoints of the searches it is finishing in the
+background in BACKGROUND_DIR, and only those are resumed in a later
+session; the checkpoints of solves in progress are in DEFAULT_DIR.
+
+    python -m solver.checkpoint                  list the background checkpoints
+    python -m solver.checkpoint resume 10000000  run each on to 10M iterations
+
+With --max-ram and --spill, resume keeps the positions seen in a
+store.StateTable that spills to disk (see store.py).
+'''
+import os
+import sys
+import pickle
+import hashlib
+import argparse
+from .cache import boardKey
+from .engine import Search, parseBoard, SOLVED, UNSOLVED
+from .store import StateTable
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'checkpoints')
+BACKGROUND_DIR = os.path.join(DEFAULT_DIR, 'background')
+SUFFIX = '.ckpt'
+TEMP_SUFFIX = '.tmp'
+VERSION = 2
+
+def path(board, dirname=DEFAULT_DIR):
+    '''
+    Name of the checkpoint file for board
+    '''
+    digest = hashlib.sha1(boardKey(board).encode()).hexdigest()
+    return os.path.join(dirname, digest[:20] + SUFFIX)
+
+def save(filename, board, search):
+    '''
+    Write search, a Search of board, to filename
+    '''
+    dirname = os.path.dirname(filename)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    header = {'version': VERSION, 'board': board, 'key': boardKey(board),
+              'iterations': search.iterations, 'generated': search.generated()}
+    temp = '%s.%d%s' % (filename, os.getpid(), TEMP_SUFFIX)
+    try:
+        with open(temp, 'wb') as fout:
+            pickle.dump(header, fout, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(search, fout, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, filename)
+    except BaseException:
+        discard(temp)
+        raise
+
+def header(filename):
+    '''
+    The header of a checkpoint, without loading the search, or None if
+    the file is missing or unreadable
+    '''
+    try:
+        with open(filename, 'rb') as fin:
+            head = pickle.load(fin)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if not isinstance(head, dict) or head.get('version') != VERSION:
+        return None
+    return head
+
+def load(filename, board):
+    '''
+    The Search saved in filename, if it is a search of a board with
+    the same rank pattern as board, else None
+    '''
+    try:
+        with open(filename, 'rb') as fin:
+            head = pickle.load(fin)
+            if head.get('version') != VERSION or head.get('key') != boardKey(board):
+                return None
+            search = pickle.load(fin)
+    except (OSError, EOFError, AttributeError, pickle.UnpicklingError):
+        return None
+    return search if isinstance(search, Search) else None
+
+def discard(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+def cleanup(dirname=DEFAULT_DIR):
+    '''
+    Remove the temporary files left in dirname by processes killed
+    while saving (those of live processes are still being written)
+    '''
+    if not os.path.isdir(dirname):
+        return
+    for name in os.listdir(dirname):
+        if not name.endswith(TEMP_SUFFIX):
+            continue
+        try:
+            pid = int(name[:-len(TEMP_SUFFIX)].rsplit('.', 1)[1])
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            discard(os.path.join(dirname, name))
+        except (ValueError, IndexError, OSError):
+            pass
+
+def listAll(dirname=DEFAULT_DIR):
+    '''
+    (filename, header) for every checkpoint in dirname
+    '''
+    if not os.path.isdir(dirname):
+        return []
+    found = []
+    for name in sorted(os.listdir(dirname)):
+        if name.endswith(SUFFIX):
+            filename = os.path.join(dirname, name)
+            head = header(filename)
+            if head is not None:
+                found.append((filename, head))
+    return found
+
+def resume(filename, maxIters=None, store=None):
+    '''
+    Run the search in a checkpoint on to maxIters iterations in all.
+    The checkpoint is removed once the search is settled, and saved
+    again if the budget runs out first.  store, if given, is
+    (maxBytes, spill) for a StateTable to hold the visited states.
+    Returns the status.
+    '''
+    head = header(filename)
+    if head is None:
+        raise ValueError('No checkpoint in %s' % filename)
+    search = load(filename, head['board'])
+    if search is None:
+        visited = StateTable(*store) if store is not None else None
+        search = Search(*parseBoard(head['board']), visited=visited)
+    elif store is not None and isinstance(search.visited, set):
+        visited = StateTable(*store)
+        visited.update(search.visited)
+        search.visited = visited
+    status = search.run(maxIters)
+    if status in (SOLVED, UNSOLVED):
+        discard(filename)
+    else:
+        save(filename, head['board'], search)
+    return status, search
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solver.checkpoint',
+                                     description='List or resume saved searches.')
+    parser.add_argument('--dir', default=BACKGROUND_DIR,
+                        help='checkpoint directory (default the background searches)')
+    parser.add_argument('command', nargs='?', default='list', choices=['list', 'resume'])
+    parser.add_argument('max_iters', nargs='?', type=int,
+                        help='budget for resume, in iterations in all (default none)')
+    parser.add_argument('--max-ram', type=int, metavar='MB',
+                        help='memory for positions seen, in megabytes (default no limit)')
+    parser.add_argument('--spill', metavar='DIR',
+                        help='directory for positions seen past --max-ram')
+    args = parser.parse_args(argv)
+    store = None
+    if args.max_ram is not None or args.spill is not None:
+        store = (args.max_ram << 20 if args.max_ram is not None else None, args.spill)
+    for filename, head in listAll(args.dir):
+        print('%-26s %11d iterations %11d states  %s' %
+              (os.path.basename(filename), head['iterations'], head['generated'], head['key']))
+        if args.command == 'resume':
+            status, search = resume(filename, args.max_iters, store)
+            print('    %s after %d iterations' % (status, search.iterations))
+            sys.stdout.flush()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
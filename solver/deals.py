@@ -0,0 +1,227 @@
+# deals.py PySol deals for black hole
+'''
+Python 3 port of the parts of make_pysol_board.py needed to deal
+PySol's Black Hole game number n, so that batch tools can generate
+boards in process instead of running make_pysol_board.py once per deal.
+The boards are identical to those printed by
+
+    python2 make_pysol_board.py -F -t n black_hole
+
+Like the rest of the tools, every function here deals games above 32000
+as PySolFC does unless told otherwise (pysolFC=False), and so does
+python -m solver.deals [-t] n; -P deals them as make_pysol_board.py
+does without -F.
+
+dealArray() deals many games at once with NumPy (which is only needed
+for that function), shuffling every deck a step at a time in parallel.
+'''
+import sys
+import random
+
+MAX_DEAL = 1000000           # largest deal number the tools accept
+
+# Card ids are as in PySol: suit major in the order CSHD, ace first
+PYSOL_SUITS = 'CSHD'
+RANK_NAMES = 'A23456789TJQK'
+ACE_OF_SPADES = 13
+
+class LCRandom31:
+    '''
+    The generator PySol uses for deals 1 to 32000
+    '''
+    MAX_SEED = 0x7fffffff
+
+    def __init__(self, seed):
+        self.seed = seed
+
+    def randint(self, a, b):
+        self.seed = (self.seed*214013 + 2531011) & self.MAX_SEED
+        return a + (self.seed >> 16) % (b+1-a)
+
+    def shuffle(self, seq):
+        n = len(seq) - 1
+        while n > 0:
+            j = self.randint(0, n)
+            seq[n], seq[j] = seq[j], seq[n]
+            n -= 1
+
+class LCRandom64(LCRandom31):
+    '''
+    The generator PySol uses for larger deal numbers
+    '''
+    MAX_SEED = 0xffffffffffffffff
+
+    def random(self):
+        self.seed = (self.seed*6364136223846793005 + 1) & self.MAX_SEED
+        return ((self.seed >> 21) & 0x7fffffff) / 2147483648.0
+
+    def randint(self, a, b):
+        return a + int(self.random() * (b+1-a))
+
+class MTRandom(random.Random):
+    '''
+    The generator PySolFC uses for larger deal numbers.  Seeding is the
+    same in Python 2 and 3, but shuffle() is not, so this is the
+    Python 2 shuffle that make_pysol_board.py ran.
+    '''
+    def shuffle(self, seq):
+        for i in reversed(range(1, len(seq))):
+            j = int(self.random() * (i+1))
+            seq[i], seq[j] = seq[j], seq[i]
+
+def cardCode(cardId, printTs=True):
+    suit, rank = divmod(cardId, 13)
+    r = RANK_NAMES[rank]
+    if r == 'T' and not printTs:
+        r = '10'
+    return r + PYSOL_SUITS[suit]
+
+def moveToBottom(ids, select, ncards=999999):
+    '''
+    PySol's _shuffleHookMoveToBottom: move up to ncards of the cards
+    for which select(id) returns (True, sortOrder) to the bottom of the
+    talon, that is the front of the list, which is dealt last.
+    '''
+    chosen, i = [], len(ids)
+    for c in ids[:]:
+        wanted, order = select(c)
+        if wanted:
+            ids.remove(c)
+            chosen.append((order, i, c))
+            if len(chosen) >= ncards:
+                break
+        i -= 1
+    chosen.sort(reverse=True)
+    return [c for order, i, c in chosen] + ids
+
+def shuffledIds(n, pysolFC=True):
+    '''
+    Card ids in the order PySol deals them for game number n
+    '''
+    ids = list(range(52))
+    if n <= 32000:
+        ids = [i + j for i in range(13) for j in (0, 39, 26, 13)]
+        LCRandom31(n).shuffle(ids)
+    elif pysolFC:
+        MTRandom(n).shuffle(ids)
+    else:
+        LCRandom64(n).shuffle(ids)
+    ids.reverse()
+    return ids
+
+def dealIds(n, pysolFC=True):
+    '''
+    Card ids of deal n in Model.deck order: the ace of spades, which
+    starts in the black hole, and then the other 51 cards in the order
+    they are dealt round the 17 piles.
+    '''
+    ids = shuffledIds(n, pysolFC)
+    return moveToBottom(ids, lambda c: (c == ACE_OF_SPADES, c // 13), 1)
+
+def deal(n, pysolFC=True):
+    '''
+    Card codes of deal n in Model.deck order
+    '''
+    return [cardCode(i) for i in dealIds(n, pysolFC)]
+
+def boardFromIds(ids, printTs=True):
+    '''
+    The board for a deal given as card ids in Model.deck order
+    '''
+    codes = [cardCode(int(i), printTs) for i in ids]
+    lines = ['Foundations: %s' % codes[0]]
+    for k in range(1, 18):
+        lines.append(' '.join(codes[k:52:17]))
+    return '\n'.join(lines) + '\n'
+
+def board(n, pysolFC=True, printTs=True):
+    '''
+    Deal n as a board for the solver
+    '''
+    return boardFromIds(dealIds(n, pysolFC), printTs)
+
+def dealArray(numbers, pysolFC=True):
+    '''
+    Deal every game in numbers at once.  Returns an (n, 52) uint8 NumPy
+    array whose rows are as returned by dealIds().  Games up to 32000
+    and, without pysolFC, larger games use the linear congruential
+    generators, which are run on all the decks together; PySolFC games
+    above 32000 use the Mersenne Twister and are dealt one at a time.
+    '''
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError('dealArray() needs NumPy; use dealIds() without it')
+    numbers = np.asarray(numbers, dtype=np.int64).reshape(-1)
+    out = np.empty((len(numbers), 52), dtype=np.uint8)
+    small = numbers <= 32000
+    if small.any():
+        out[small] = shuffleLC31(np, numbers[small])
+    large = ~small
+    if large.any() and not pysolFC:
+        out[large] = shuffleLC64(np, numbers[large])
+    elif large.any():
+        out[large] = [shuffledIds(int(n), True) for n in numbers[large]]
+    # move the ace of spades to the front, keeping the others in order
+    rest = out[out != ACE_OF_SPADES].reshape(len(numbers), 51)
+    out[:, 0] = ACE_OF_SPADES
+    out[:, 1:] = rest
+    return out
+
+def swapColumns(np, ids, n, j):
+    rows = np.arange(len(ids))
+    top = ids[:, n].copy()
+    ids[:, n] = ids[rows, j]
+    ids[rows, j] = top
+
+def shuffleLC31(np, seeds):
+    '''
+    LCRandom31 shuffles of the decks seeded by seeds, reversed
+    '''
+    order = [i + j for i in range(13) for j in (0, 39, 26, 13)]
+    ids = np.tile(np.array(order, dtype=np.uint8), (len(seeds), 1))
+    seed = seeds.astype(np.int64)
+    for n in range(51, 0, -1):
+        seed = (seed*214013 + 2531011) & LCRandom31.MAX_SEED
+        swapColumns(np, ids, n, (seed >> 16) % (n+1))
+    return ids[:, ::-1]
+
+def shuffleLC64(np, seeds):
+    '''
+    LCRandom64 shuffles of the decks seeded by seeds, reversed
+    '''
+    ids = np.tile(np.arange(52, dtype=np.uint8), (len(seeds), 1))
+    seed = seeds.astype(np.uint64)
+    mult = np.uint64(6364136223846793005)
+    one, shift = np.uint64(1), np.uint64(21)
+    with np.errstate(over='ignore'):
+        for n in range(51, 0, -1):
+            seed = seed*mult + one          # wraps modulo 2**64
+            r = ((seed >> shift) & np.uint64(0x7fffffff)).astype(np.float64) / 2147483648.0
+            swapColumns(np, ids, n, (r * (n+1)).astype(np.int64))
+    return ids[:, ::-1]
+
+def main(argv=None):
+    '''
+    Command line like make_pysol_board.py for black_hole, except that
+    -F is the default (and still accepted) and -P turns it off
+    '''
+    args = list(sys.argv[1:] if argv is None else argv)
+    pysolFC = True
+    printTs = False
+    while args and args[0].startswith('-'):
+        flag = args.pop(0)
+        if flag in ('-F', '--pysolfc'):
+            pysolFC = True
+        elif flag in ('-P', '--pysol'):
+            pysolFC = False
+        elif flag == '-t':
+            printTs = True
+        else:
+            sys.exit('Unknown flag %s' % flag)
+    if not args or args[1:] not in ([], ['black_hole']):
+        sys.exit('usage: python -m solver.deals [-F | -P] [-t] game_number [black_hole]')
+    sys.stdout.write(board(int(args[0]), pysolFC, printTs))
+
+if __name__ == '__main__':
+    main()
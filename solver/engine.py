@@ -0,0 +1,380 @@
+# engine.py Search engine for black hole
+'''
+A pure Python solver for Black Hole solitaire.
+
+A position is completely described by the heights of the 17 tableau piles
+and the rank of the card on top of the black hole, so the search packs
+those into a single integer and remembers every integer it has seen.
+Since the search stops at the first solution, every state in the visited
+set other than those on the current path is known to be dead.
+
+Suits play no part, and which pile holds what does not matter either:
+two positions with the same hole rank whose piles hold the same rank
+sequences, in any arrangement, have the same future.  So by default the
+integer counts the piles holding each distinct rank sequence, rather
+than recording each pile's height, and such positions are searched once.
+'''
+import re
+import random
+
+UNSOLVED = 'unsolved'
+INTRACTABLE = 'intractable'
+SOLVED = 'solved'
+
+NUM_PILES = 17
+RANK_NAMES = 'A23456789TJQK'      # index is rank-1
+SUIT_NAMES = 'SHDC'
+# Move orderings: 'counts' tries the ranks with the most copies left
+# first, 'deep' the tallest piles first, 'piles' the piles in turn
+ORDERS = ('counts', 'deep', 'piles')
+
+cardPattern = re.compile(r'(10|[A2-9TJQK])([SHDC])', re.I)
+
+def cardRank(code):
+    '''
+    Rank of a card code such as 'QS' or '10H', from 1 (ace) to 13 (king)
+    '''
+    r = code[:-1].upper()
+    if r == '10':
+        r = 'T'
+    return RANK_NAMES.index(r) + 1
+
+def parseBoard(text):
+    '''
+    Parse a board in the format read by black-hole-solve.  The first
+    line names the card in the black hole, each following line is a
+    tableau pile listed from the bottom card to the top card.
+    Returns (piles, hole) where piles is a list of lists of card codes.
+    A blank line after the foundations line is an empty pile.
+    '''
+    hole = None
+    piles = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line and hole is None:
+            continue
+        if line.startswith('Foundations:'):
+            cards = cardPattern.findall(line)
+            if len(cards) != 1:
+                raise ValueError('Bad foundations line: %r' % line)
+            hole = ''.join(cards[0]).upper()
+            continue
+        codes = line.split()
+        for code in codes:
+            if not cardPattern.fullmatch(code):
+                raise ValueError('Bad card %r in line %r' % (code, line))
+        piles.append([c.upper() for c in codes])
+    if hole is None:
+        raise ValueError('Board has no foundations line')
+    while len(piles) > NUM_PILES and not piles[-1]:
+        piles.pop()
+    while len(piles) < NUM_PILES:
+        piles.append([])
+    if len(piles) != NUM_PILES:
+        raise ValueError('Board has %d piles, expected %d' % (len(piles), NUM_PILES))
+    return piles, hole
+
+def reachable(mask):
+    '''
+    Are the ranks in the 13 bit mask contiguous on the cycle of ranks?
+    The hole can only move between ranks that still have cards, so the
+    remaining ranks together with the hole rank must form a single arc.
+    '''
+    full = (1 << 13) - 1
+    if mask in (0, full):
+        return True
+    ends = 0
+    for r in range(13):
+        if mask >> r & 1 and not mask >> ((r+1) % 13) & 1:
+            ends += 1
+    return ends == 1
+
+CONNECTED = [reachable(m) for m in range(1 << 13)]
+
+class Search:
+    '''
+    Depth first search over the positions reachable from a board.
+    Ranks are held internally as 0 (ace) to 12 (king).
+
+    The search state (the stack of untried moves, the path and the
+    visited set) lives on the instance, so run() can be called again
+    with a larger budget after it returns INTRACTABLE.
+
+    order is one of ORDERS.  A seed shuffles the order in which the
+    piles are looked at, which breaks the ties of the ordering (or,
+    for 'piles', is the ordering) differently for each seed.  With
+    symmetry false, positions are told apart by their pile heights
+    alone (see pack()).  visited is an empty set-like store for the
+    positions seen, such as a store.StateTable; by default a set.
+
+    play() and split() let a search be shared out among processes (see
+    parallel.py): split() hands over an untried move, and play() starts
+    another search from the position it leads to.
+    '''
+    def __init__(self, piles, hole, rankReachPrune=True, order='counts', seed=None,
+                 symmetry=True, visited=None):
+        if order not in ORDERS:
+            raise ValueError('Unknown move ordering %r' % order)
+        self.codes = [list(p) for p in piles]
+        self.ranks = [[cardRank(c)-1 for c in p] for p in piles]
+        self.holeRank = cardRank(hole) - 1
+        self.rankReachPrune = rankReachPrune
+        self.order = order
+        self.seed = seed
+        self.played = []
+        self.pileOrder = list(range(NUM_PILES))
+        if seed is not None:
+            random.Random(seed).shuffle(self.pileOrder)
+        # tops[i][h] is the rank exposed on pile i when it holds h cards
+        self.tops = [[99] + p for p in self.ranks]
+        # adjacent[r][s] is true if a card of rank s may go on rank r
+        self.adjacent = [[(s-r) % 13 in (1, 12) for s in range(13)] + [False]*87
+                         for r in range(13)]
+        # delta[i][h] changes the packed position when pile i goes from h to h-1
+        self.delta, self.key = self.pack(symmetry)
+        self.heights = [len(p) for p in self.ranks]
+        self.rank = self.holeRank
+        self.counts = [0]*13
+        for p in self.ranks:
+            for r in p:
+                self.counts[r] += 1
+        self.mask = sum(1 << r for r in range(13) if self.counts[r])
+        self.remaining = sum(self.heights)
+        self.path = []
+        self.holeRanks = []
+        self.stack = [self.candidates()]
+        self.visited = set() if visited is None else visited
+        self.visited.add(self.key | self.rank)
+        self.iterations = 0
+        self.moves = None
+        self.status = None
+
+    def play(self, moves):
+        '''
+        Make moves (pile numbers, as in self.moves) from the starting
+        position, before run(), and search from where they lead.  The
+        search never undoes them, and they begin self.moves.  Returns
+        False, leaving nothing to search or split(), if that position is
+        already in the visited set.
+        '''
+        heights = self.heights
+        counts = self.counts
+        for i in moves:
+            h = heights[i]
+            r = self.tops[i][h]
+            if not self.adjacent[self.rank][r]:
+                raise ValueError('Cannot move from pile %d' % i)
+            heights[i] = h - 1
+            self.key += self.delta[i][h]
+            counts[r] -= 1
+            if counts[r] == 0:
+                self.mask ^= 1 << r
+            self.rank = r
+            self.remaining -= 1
+        self.played = self.played + list(moves)
+        if self.key | self.rank in self.visited:
+            self.stack = []
+            self.played = []
+            return False
+        self.visited.add(self.key | self.rank)
+        if self.rankReachPrune and not CONNECTED[self.mask | 1 << self.rank]:
+            self.stack = [[]]
+        else:
+            self.stack = [self.candidates()]
+        return True
+
+    def split(self):
+        '''
+        Give up the untried move nearest the start, which is the one
+        with the most below it, and return the moves that make it, for
+        another search to play().  None if there are no untried moves.
+        '''
+        for d, cands in enumerate(self.stack):
+            if cands:
+                return self.played + self.path[:d] + [cands.pop(0)]
+        return None
+
+    def pack(self, symmetry):
+        '''
+        The table of changes to the packed position for each move, and
+        the packed starting position.  The low 4 bits are left for the
+        hole rank.
+
+        Without symmetry each pile has a 2 bit field for its height.
+        With it, each rank sequence that can be left on a pile (a
+        prefix of one or more piles, the empty one included) has a field
+        just wide enough to count the piles it is a prefix of, and the
+        position is the sum of the fields for what each pile holds.
+        The fields do not overlap, so positions pack to the same integer
+        exactly when their piles hold the same sequences.
+        '''
+        if not symmetry:
+            delta = [[0] + [-(1 << (2*i+4))]*len(p) for i, p in enumerate(self.ranks)]
+            return delta, sum(len(p) << (2*i+4) for i, p in enumerate(self.ranks))
+        holders = {}
+        for i, p in enumerate(self.ranks):
+            for h in range(len(p)+1):
+                holders[tuple(p[:h])] = holders.get(tuple(p[:h]), 0) + 1
+        weight = {}
+        shift = 4
+        for prefix in sorted(holders, key=lambda t: (len(t), t)):
+            weight[prefix] = 1 << shift
+            shift += holders[prefix].bit_length()
+        delta = [[0] + [weight[tuple(p[:h-1])] - weight[tuple(p[:h])]
+                        for h in range(1, len(p)+1)] for p in self.ranks]
+        return delta, sum(weight[tuple(p)] for p in self.ranks)
+
+    def candidates(self):
+        '''
+        Piles whose top card can be moved onto the hole right now, in
+        the order they are to be tried (last first).  By default cards of
+        the ranks with the most copies left in the tableau are tried
+        first, which finds solutions far sooner than taking the piles in
+        order.
+        '''
+        adj = self.adjacent[self.rank]
+        heights = self.heights
+        tops = self.tops
+        cands = [i for i in self.pileOrder if adj[tops[i][heights[i]]]]
+        key = self.sortKey()
+        if key is not None:
+            cands.sort(key=key)
+        return cands
+
+    def sortKey(self):
+        '''
+        Key that sorts candidate piles for the move ordering, or None to
+        leave them in pile order
+        '''
+        heights = self.heights
+        if self.order == 'deep':
+            return heights.__getitem__
+        if self.order == 'counts':
+            tops = self.tops
+            counts = self.counts
+            return lambda j: counts[tops[j][heights[j]]]
+        return None
+
+    def run(self, maxIters=None, step=0, callback=None):
+        '''
+        Search until a solution is found, the search space is exhausted or
+        the total number of iterations exceeds maxIters.  If step is
+        positive, callback(self) is called every step iterations and the
+        search stops (returning None) if it returns a true value.
+        Returns SOLVED, UNSOLVED or INTRACTABLE, or None if stopped.
+        '''
+        if self.status in (SOLVED, UNSOLVED):
+            return self.status
+        if self.remaining == 0:
+            self.moves = list(self.played)
+            self.status = SOLVED
+            return SOLVED
+        limit = float('inf') if maxIters is None else maxIters
+        nextCall = self.iterations + step if step > 0 else float('inf')
+        # Local copies of everything touched in the inner loop
+        stack = self.stack
+        path = self.path
+        holeRanks = self.holeRanks
+        visited = self.visited
+        heights = self.heights
+        tops = self.tops
+        delta = self.delta
+        counts = self.counts
+        adjacent = self.adjacent
+        connected = CONNECTED
+        prune = self.rankReachPrune
+        piles = self.pileOrder
+        sortKey = self.sortKey()
+        key, rank, mask = self.key, self.rank, self.mask
+        remaining = self.remaining
+        iterations = self.iterations
+        status = None
+        while stack:
+            cands = stack[-1]
+            if not cands:
+                stack.pop()
+                if path:
+                    i = path.pop()
+                    h = heights[i]
+                    r = tops[i][h+1]
+                    heights[i] = h + 1
+                    key -= delta[i][h+1]
+                    if counts[r] == 0:
+                        mask |= 1 << r
+                    counts[r] += 1
+                    rank = holeRanks.pop()
+                    remaining += 1
+                continue
+            i = cands.pop()
+            h = heights[i]
+            r = tops[i][h]
+            k = key + delta[i][h]
+            if k | r in visited:
+                continue
+            if iterations >= limit:
+                cands.append(i)
+                status = INTRACTABLE
+                break
+            if iterations >= nextCall:
+                nextCall += step
+                self.iterations = iterations
+                if callback(self):
+                    cands.append(i)
+                    break
+            iterations += 1
+            visited.add(k | r)
+            heights[i] = h - 1
+            key = k
+            counts[r] -= 1
+            if counts[r] == 0:
+                mask ^= 1 << r
+            holeRanks.append(rank)
+            rank = r
+            path.append(i)
+            remaining -= 1
+            if remaining == 0:
+                status = SOLVED
+                break
+            if prune and not connected[mask | 1 << rank]:
+                stack.append([])
+                continue
+            adj = adjacent[rank]
+            cands = [j for j in piles if adj[tops[j][heights[j]]]]
+            if len(cands) > 1 and sortKey is not None:
+                cands.sort(key=sortKey)
+            stack.append(cands)
+        else:
+            status = UNSOLVED
+        self.key, self.rank, self.mask = key, rank, mask
+        self.remaining = remaining
+        self.iterations = iterations
+        if status == SOLVED:
+            self.moves = self.played + path
+        if status is not None:
+            self.status = status
+        return status
+
+    def generated(self):
+        '''
+        Number of distinct states seen by the search
+        '''
+        return len(self.visited)
+
+    def movedCards(self):
+        '''
+        Codes of the cards moved by the solution, in order.
+        '''
+        piles = [list(p) for p in self.codes]
+        return [piles[k].pop() for k in self.moves]
+
+def solve(board, maxIters=75000000, rankReachPrune=True, order='counts', seed=None):
+    '''
+    Solve a board given as text in black-hole-solve format.
+    Returns the list of piles to move from, UNSOLVED or INTRACTABLE.
+    '''
+    piles, hole = parseBoard(board)
+    search = Search(piles, hole, rankReachPrune, order, seed)
+    status = search.run(maxIters)
+    if status == SOLVED:
+        return search.moves
+    return status
@@ -1,30 +1,18 @@
 #makeBoard.py
 '''
-Interface into make_pysol_board.py
+Write the board for a PySol deal to test/board<index>.txt
 Input is the index of the board to make
 '''
-import subprocess, sys
-import time
+import sys
+from deals import board
 
 try:
     index = sys.argv[1]
     if not 1 <= int(index) <= 1000000:
         print('Invalid index value')
         exit()
-    cmd =['python2', 'make_pysol_board.py', '-F', '-t'] 
     output = 'test/board%s.txt'%index
-    cmd += [index, 'black_hole']
-    subprocess.run(cmd, stdout=open(output,'w'))
-    '''
-    The following is just an example of how to 
-    capture stdout, without writing it to file
-    or dumping it to the console.
-    '''
-    #proc = subprocess.run(cmd, stdout=subprocess.PIPE, universal_newlines=True)
-    #text = proc.stdout
-    #print('here it comes')
-    #print(text)
+    with open(output, 'w') as fout:
+        fout.write(board(int(index), pysolFC=True, printTs=True))
 except IndexError:
     print('Fatal: board index missing')
-
-
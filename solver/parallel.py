@@ -0,0 +1,378 @@
+# parallel.py Search one board on several cores
+'''
+ParallelSearch runs the search of a single board in several processes.
+It has the interface of engine.Search, so python -m solver --workers N
+uses it in place of one.
+
+The board is first searched alone for WARMUP_ITERS iterations, which
+settles the easy ones without starting a process.  Every move that
+search left untried then becomes a work unit, the moves from the start
+that make it, in the order the search would have tried them.  Workers
+take units from a queue and search below each with Search.play().  A
+worker that sees others waiting for work gives away the untried move
+nearest the start of its own search (Search.split()), so the work is
+shared out until the end.  The first worker to find a solution stops
+the rest.
+
+Each worker keeps the positions it has seen in a set of its own, so it
+searches as fast as a plain Search.  The workers tell each other what
+they have seen in batches, through logs in a block of shared memory of
+maxBytes: every WORKER_STEP iterations a worker appends the positions
+it has added since the last time to its own log, and puts the new
+entries of the others' logs in its set.  A worker skips a position
+another has reached, even one that is still being searched below, but
+since every move takes a card, that one finishes the search below it,
+so nothing is missed.  A position two workers reach within a batch of
+each other is searched by both, which only costs time.  When a worker's
+log is full it keeps what it sees after that to itself.  Every worker
+holds every logged position, so the search takes up to workers times
+the memory of a single one.
+
+A worker that fails sends back the error, and run() raises
+RuntimeError, as it does if a worker dies without a word.
+
+python -m solver.parallel checks it: it searches CHECK_DEALS (or the
+deals given) alone and with several workers, and exits with status 1
+if the answers differ or a solution does not play out.
+
+This is for the command line only.  The game and the pool do not use
+it: pool workers are daemon processes, which may not start processes of
+their own, and the pool already keeps every core busy with the boards
+queued.
+'''
+import os
+import sys
+import time
+import queue
+import array
+import traceback
+import multiprocessing
+from multiprocessing import shared_memory
+import argparse
+from . import deals
+from .engine import Search, parseBoard, SOLVED, UNSOLVED, INTRACTABLE
+
+WARMUP_ITERS = 20000         # searched alone before starting the workers
+WORKER_STEP = 10000          # iterations between a worker's exchanges of positions
+POLL = 0.05                  # seconds between the checks of the main process
+SHARED_BYTES = 1 << 28       # default size of the shared logs
+# deals the workers take to the end, unsolvable (265, 354, 359) and not
+CHECK_DEALS = (265, 354, 359, 13, 79)
+
+class LoggedStates(set):
+    '''
+    The visited set of a worker.  fresh holds the positions added since
+    they were last logged; those taken from the other workers' logs go
+    in with update(), which leaves fresh alone.
+    '''
+    def __init__(self):
+        set.__init__(self)
+        self.fresh = []
+
+    def add(self, key):
+        set.add(self, key)
+        self.fresh.append(key)
+
+class Logs:
+    '''
+    The logs of positions seen, in slots (unsigned 64 bit integers in
+    shared memory): log 0 for the search before the workers started,
+    then one for each worker.  bounds[j] is the first and last slot of
+    log j, and filled[j] the number of positions in it, which only its
+    writer changes.
+    '''
+    def __init__(self, slots, bounds, filled):
+        self.slots = slots
+        self.bounds = bounds
+        self.filled = filled
+        self.read = [0]*len(bounds)
+
+    def write(self, j, keys):
+        '''
+        Append to log j as many of keys as fit
+        '''
+        start, end = self.bounds[j]
+        n = self.filled[j]
+        m = min(len(keys), end - start - n)
+        if m > 0:
+            self.slots[start+n:start+n+m] = array.array('Q', keys[:m])
+            self.filled[j] = n + m
+
+    def readInto(self, visited, me):
+        '''
+        Put the positions logged since the last call in visited, except
+        those in log me
+        '''
+        slots = self.slots
+        for j, (start, end) in enumerate(self.bounds):
+            n = self.filled[j]
+            if j != me and n > self.read[j]:
+                visited.update(slots[start+self.read[j]:start+n])
+                self.read[j] = n
+
+def work(piles, hole, rankReachPrune, order, seed, shmName, bounds, filled, me, units,
+         results, stop, pending, waiting, queued, checked):
+    '''
+    A worker process: search units until stopped.  Sends ('solved',
+    moves), ('memory', None) or ('error', traceback) to results.
+    '''
+    shm = shared_memory.SharedMemory(shmName)
+    slots = shm.buf.cast('Q')
+    logs = Logs(slots, bounds, filled)
+    visited = LoggedStates()
+    counted = [0]
+    search = None
+
+    def exchange():
+        logs.write(me, visited.fresh)
+        del visited.fresh[:]
+        logs.readInto(visited, me)
+
+    def count(search):
+        with checked.get_lock():
+            checked.value += search.iterations - counted[0]
+        counted[0] = search.iterations
+
+    def share(search):
+        count(search)
+        if stop.is_set():
+            return True
+        exchange()
+        if waiting.value > queued.value:
+            moves = search.split()
+            if moves is not None:
+                with pending.get_lock():
+                    pending.value += 1
+                with queued.get_lock():
+                    queued.value += 1
+                units.put(moves)
+        return False
+
+    try:
+        while not stop.is_set():
+            with waiting.get_lock():
+                waiting.value += 1
+            try:
+                moves = units.get(timeout=POLL)
+            except queue.Empty:
+                moves = None
+            with waiting.get_lock():
+                waiting.value -= 1
+            if moves is None:
+                continue
+            with queued.get_lock():
+                queued.value -= 1
+            exchange()
+            search = Search(piles, hole, rankReachPrune, order, seed, visited=visited)
+            counted[0] = 0
+            if search.play(moves):
+                status = search.run(None, WORKER_STEP, share)
+            else:
+                status = UNSOLVED
+            count(search)
+            if status == SOLVED:
+                results.put(('solved', search.moves))
+                stop.set()
+            elif status == UNSOLVED:
+                with pending.get_lock():
+                    pending.value -= 1
+    except MemoryError:
+        results.put(('memory', None))
+        stop.set()
+    except Exception:
+        results.put(('error', traceback.format_exc()))
+        stop.set()
+    logs = visited = search = None
+    slots.release()
+    shm.close()
+
+class ParallelSearch:
+    '''
+    A search of one board by workers processes (by default one a core),
+    sharing logs of maxBytes.  run() may be called once.
+    '''
+    def __init__(self, piles, hole, rankReachPrune=True, order='counts', seed=None,
+                 workers=None, maxBytes=SHARED_BYTES):
+        self.piles = piles
+        self.hole = hole
+        self.codes = [list(p) for p in piles]
+        self.rankReachPrune = rankReachPrune
+        self.order = order
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+        self.maxBytes = maxBytes
+        self.iterations = 0
+        self.states = 0
+        self.moves = None
+        self.status = None
+
+    def run(self, maxIters=None, step=0, callback=None):
+        '''
+        As Search.run(), except that maxIters and step are only checked
+        every few hundredths of a second
+        '''
+        limit = float('inf') if maxIters is None else maxIters
+        search = Search(self.piles, self.hole, self.rankReachPrune, self.order, self.seed)
+        status = search.run(min(limit, WARMUP_ITERS))
+        self.iterations = search.iterations
+        self.states = search.generated()
+        if status != INTRACTABLE or limit <= WARMUP_ITERS:
+            self.moves = search.moves
+            self.status = status
+            return status
+        units = []
+        while True:
+            moves = search.split()
+            if moves is None:
+                break
+            units.append(moves)
+        units.reverse()
+
+        known = list(search.visited)
+        search = None
+        size = max(self.maxBytes // 8, len(known) + self.workers)
+        share = (size - len(known)) // self.workers
+        bounds = [(0, len(known))] + [(len(known) + k*share, len(known) + (k+1)*share)
+                                      for k in range(self.workers)]
+        context = multiprocessing.get_context('spawn')
+        shm = shared_memory.SharedMemory(create=True, size=8*size)
+        slots = shm.buf.cast('Q')
+        procs = []
+        stop = context.Event()
+        try:
+            filled = context.Array('q', len(bounds), lock=False)
+            slots[:len(known)] = array.array('Q', known)
+            filled[0] = len(known)
+            known = None
+            unitQueue = context.Queue()
+            results = context.Queue()
+            pending = context.Value('i', len(units))
+            waiting = context.Value('i', 0)
+            queued = context.Value('i', len(units))
+            checked = context.Value('q', self.iterations)
+            for moves in units:
+                unitQueue.put(moves)
+            procs = [context.Process(target=work, daemon=True,
+                                     args=(self.piles, self.hole, self.rankReachPrune,
+                                           self.order, self.seed, shm.name, bounds, filled,
+                                           k+1, unitQueue, results, stop, pending, waiting,
+                                           queued, checked))
+                     for k in range(self.workers)]
+            for proc in procs:
+                proc.start()
+            status = self.watch(procs, results, pending, checked, limit, step, callback)
+            self.iterations = checked.value
+            self.states = sum(filled)
+        finally:
+            stop.set()
+            for proc in procs:
+                proc.join(1)
+                if proc.is_alive():
+                    proc.terminate()
+                    proc.join()
+            slots.release()
+            shm.close()
+            shm.unlink()
+        if status is not None:
+            self.status = status
+        return status
+
+    def watch(self, procs, results, pending, checked, limit, step, callback):
+        '''
+        Wait for the workers to solve the board, run out of work or
+        reach the limit, and report progress every step iterations
+        '''
+        nextCall = step if step > 0 else float('inf')
+        while True:
+            try:
+                return self.settle(*results.get(timeout=POLL))
+            except queue.Empty:
+                pass
+            self.iterations = checked.value
+            if pending.value == 0:
+                return UNSOLVED
+            if self.iterations >= limit:
+                return INTRACTABLE
+            if not all(proc.is_alive() for proc in procs):
+                try:                        # what it sent before it stopped
+                    return self.settle(*results.get(timeout=1))
+                except queue.Empty:
+                    raise RuntimeError('a search worker died')
+            if self.iterations >= nextCall:
+                while nextCall <= self.iterations:
+                    nextCall += step
+                if callback(self):
+                    return None
+
+    def settle(self, kind, value):
+        '''
+        The status for a message from a worker
+        '''
+        if kind == 'error':
+            raise RuntimeError('a search worker failed:\n%s' % value)
+        if kind == 'memory':
+            return INTRACTABLE
+        self.moves = value
+        return SOLVED
+
+    def generated(self):
+        '''
+        Number of states in the shared logs (approximately the distinct
+        states seen)
+        '''
+        return self.states
+
+def plays(piles, hole, moves):
+    '''
+    True if moves play every card on the board to the hole
+    '''
+    search = Search(piles, hole)
+    try:
+        search.play(moves)
+    except ValueError:
+        return False
+    return search.remaining == 0
+
+def check(dealList, workers, maxIters=None, out=sys.stdout):
+    '''
+    Search each deal alone and with workers processes.  Returns the
+    number of deals on which they disagree.
+    '''
+    failed = 0
+    for deal in dealList:
+        piles, hole = parseBoard(deals.board(deal))
+        start = time.time()
+        alone = Search(piles, hole)
+        expected = alone.run(maxIters)
+        single = time.time() - start
+        start = time.time()
+        search = ParallelSearch(piles, hole, workers=workers)
+        try:
+            status = search.run(maxIters)
+        except RuntimeError as e:
+            status = str(e)
+        ok = status == expected and (status != SOLVED or plays(piles, hole, search.moves))
+        failed += not ok
+        out.write('%6d %-10s %9d %6.1fs  %d workers %-10s %9d %6.1fs  %s\n' %
+                  (deal, expected, alone.iterations, single, workers, status,
+                   search.iterations, time.time() - start, 'ok' if ok else 'FAILED'))
+        out.flush()
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solver.parallel',
+                                     description='Check the parallel search against a single one.')
+    parser.add_argument('deals', type=int, nargs='*', help='deals (default %s)' %
+                        ' '.join(str(n) for n in CHECK_DEALS))
+    parser.add_argument('--workers', type=int, default=3, metavar='N')
+    parser.add_argument('--max-iters', type=int, help='limit for both searches')
+    args = parser.parse_args(argv)
+    failed = check(args.deals or CHECK_DEALS, args.workers, args.max_iters)
+    if failed:
+        print('%d deals FAILED' % failed)
+        return 1
+    print('all agree')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,570 @@
+# pool.py Warm pool of solver workers
+'''
+Starting a solver process for every deal costs more than solving most
+deals.  A SolverPool starts its workers once, each a long lived process
+that solves one board at a time sent to it over a pipe.  A thread in
+the parent hands queued jobs to idle workers and collects the results.
+
+A running job is cancelled through a flag shared with its worker, which
+the search checks every CHECK_STEP iterations, so the worker is free
+for the next job almost at once.  The flag is CANCEL when the job is
+cancelled, and STOP when it is only stopped for now (preempted, or the
+pool shutting down).
+
+Jobs are queued by priority, lowest number first.  Jobs with a priority
+above zero are background work: when a priority zero job is waiting
+and every worker is busy, a background job is stopped and requeued to
+make room for it.  The timeout applies only to priority zero jobs;
+background jobs are bounded by their budgets and give way anyway.
+
+A job may name a checkpoint file (see checkpoint.py).  The worker then
+resumes the search saved there, if any, and saves it again when the
+budget runs out or the job is stopped, and every CHECKPOINT_STEP
+iterations along the way, so no work is lost to a larger budget later.
+The checkpoint is deleted once the search is settled or the job is
+cancelled.  A search that runs out of memory leaves the last one it
+saved, so it can go on with a store (below).
+A job may also give a store, (maxBytes, spill directory), for a
+store.StateTable to keep the positions seen in place of a set.  With a
+spill directory the memory limit is lifted for the job, since the table
+keeps to maxBytes in memory and maps the rest from disk.
+
+race() solves one board with several configurations at once (pruning on
+or off, different move orderings), since which is fastest varies from
+deal to deal.  The first definite answer wins and the other jobs are
+cancelled at once.  The pool's memory limit is shared out among the
+jobs of a race, so a race takes no more memory than one job.
+'''
+import os
+import time
+import itertools
+import threading
+import heapq
+import multiprocessing
+from multiprocessing.connection import wait
+from .engine import Search, parseBoard, SOLVED, UNSOLVED, INTRACTABLE
+from .records import resetPeak, jobPeakRSS
+from .store import StateTable
+from . import checkpoint
+
+CANCELLED = 'cancelled'
+ERROR = 'error'
+CHECK_STEP = 10000       # iterations between checks for cancellation
+CANCEL = 1               # values of a worker's cancel flag
+STOP = 2
+STOP_WAIT = 30           # seconds a stopping worker has to save its checkpoint
+CHECKPOINT_MIN = 1000000     # searches shorter than this are not worth saving
+CHECKPOINT_STEP = 25000000   # iterations between saves of a long search
+# Configurations raced by SolverPool.race(), (rankReachPrune, order, seed),
+# in the order they are used.  On the first 60 deals of solved150.txt with
+# 1M iterations each the first solves 32, the first two 44 and the first
+# three 46; other seeds for the ordering's ties help most, then 'deep'.
+PORTFOLIO = [(True, 'counts', None),
+             (True, 'counts', 1),
+             (True, 'counts', 2),
+             (True, 'deep', None),
+             (False, 'counts', 3),
+             (True, 'deep', 4),
+             (True, 'counts', 5),
+             (False, 'counts', 6)]
+
+def work(conn, cancel, progress, memoryLimit):
+    '''
+    Main loop of a worker process
+    '''
+    resource = None
+    if os.name == 'posix':
+        import resource
+        hardLimit = resource.getrlimit(resource.RLIMIT_AS)[1]
+
+    saveTo = None
+    nextSave = None
+
+    def check(search):
+        nonlocal nextSave
+        progress.value = search.iterations
+        if saveTo is not None and search.iterations >= nextSave:
+            checkpoint.save(saveTo, board, search)
+            nextSave = search.iterations + CHECKPOINT_STEP
+        return cancel.value
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        jobId, board, maxIters, rankReachPrune, order, seed, saveTo, store, memory = msg
+        progress.value = 0
+        search = None
+        cpu = time.process_time()
+        measured = resetPeak()
+        if resource is not None:
+            limits = [limit for limit in (memoryLimit, memory) if limit is not None]
+            if not limits or (store is not None and store[1] is not None):
+                soft = hardLimit
+            else:
+                soft = min(limits)
+            resource.setrlimit(resource.RLIMIT_AS, (soft, hardLimit))
+        try:
+            piles, hole = parseBoard(board)
+            if saveTo is not None:
+                search = checkpoint.load(saveTo, board)
+            if search is None or (search.rankReachPrune, search.order, search.seed) != (
+                    rankReachPrune, order, seed):
+                visited = StateTable(*store) if store is not None else None
+                search = Search(piles, hole, rankReachPrune, order, seed, visited=visited)
+            elif store is not None and isinstance(search.visited, set):
+                visited = StateTable(*store)
+                visited.update(search.visited)
+                search.visited = visited
+            resumed = search.iterations
+            nextSave = resumed + CHECKPOINT_STEP
+            status = search.run(maxIters, CHECK_STEP, check)
+            if status is None:
+                status = CANCELLED
+            if saveTo is not None:
+                if status in (SOLVED, UNSOLVED) or (status == CANCELLED and
+                                                    cancel.value == CANCEL):
+                    checkpoint.discard(saveTo)
+                elif search.iterations >= max(CHECKPOINT_MIN, resumed + 1):
+                    checkpoint.save(saveTo, board, search)
+            result = (jobId, status, search.moves, search.iterations, search.generated())
+        except MemoryError:
+            # the search outgrew the memory limit; any checkpoint saved
+            # earlier is kept, to go on with a store that can spill
+            iterations = search.iterations if search is not None else 0
+            search = None
+            result = (jobId, INTRACTABLE, None, iterations, None)
+        except OSError as e:        # most likely the disk is full
+            result = (jobId, ERROR, str(e), 0, None)
+        except ValueError as e:
+            result = (jobId, ERROR, str(e), 0, None)
+        if search is not None and isinstance(search.visited, StateTable):
+            search.visited.close()
+        search = None
+        # the worker's lifetime peak would include earlier jobs, so
+        # without a peak of this job alone there is none
+        rss = jobPeakRSS() if measured else None
+        conn.send(result + (time.process_time() - cpu, rss))
+
+class Job:
+    '''
+    A board submitted to a SolverPool.  status() is 'running' until
+    the result is in, then SOLVED, UNSOLVED or INTRACTABLE.
+    '''
+    ids = itertools.count()
+
+    def __init__(self, pool, board, maxIters, rankReachPrune, priority, checkpoint=None,
+                 order='counts', seed=None, store=None, memory=None):
+        self.id = next(Job.ids)
+        self.pool = pool
+        self.board = board
+        self.maxIters = maxIters
+        self.rankReachPrune = rankReachPrune
+        self.priority = priority
+        self.checkpoint = checkpoint
+        self.order = order
+        self.seed = seed
+        self.store = store
+        self.memory = memory
+        self.race = None
+        self.preempted = False
+        self.cancelled = False
+        self.worker = None
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.moves = None
+        self.iterations = 0
+        self.generated = None
+        self.cpu = None
+        self.rss = None
+        self.done = threading.Event()
+
+    def status(self):
+        if self.result is None:
+            return 'running'
+        if self.result in (CANCELLED, ERROR):
+            return INTRACTABLE
+        return self.result
+
+    def progress(self):
+        '''
+        Number of iterations the search has made so far
+        '''
+        worker = self.worker
+        if self.result is None and worker is not None:
+            return worker.progress.value
+        return self.iterations
+
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        return self.status()
+
+    def stats(self):
+        '''
+        Measurements of the solve for the log of solves
+        '''
+        flags = '--rank-reach-prune ' if self.rankReachPrune else ''
+        if self.maxIters is not None:
+            flags += '--max-iters %d ' % self.maxIters
+        if self.order != 'counts':
+            flags += '--order %s ' % self.order
+        if self.seed is not None:
+            flags += '--seed %d' % self.seed
+        wall = None
+        if self.started is not None:
+            wall = (self.finished or time.time()) - self.started
+        return {'checked': self.iterations, 'generated': self.generated,
+                'iterations': self.iterations, 'wall': wall, 'cpu': self.cpu,
+                'rss': self.rss, 'flags': flags.strip()}
+
+    def cancel(self):
+        self.pool.cancel(self)
+
+    def promote(self):
+        self.pool.promote(self)
+
+    def finish(self, result, moves=None, iterations=0, generated=None, cpu=None, rss=None):
+        self.result = result
+        self.moves = moves
+        self.iterations = iterations
+        self.generated = generated
+        self.cpu = cpu
+        self.rss = rss
+        self.finished = time.time()
+        self.worker = None
+        self.done.set()
+        if self.race is not None:
+            self.race.settle(self)
+
+class Race:
+    '''
+    Jobs solving one board with different configurations, submitted by
+    SolverPool.race().  The first job to find a solution or show there
+    is none wins, and the others are cancelled.  It has the interface
+    of a Job; when no job wins, the first job's result stands.
+    '''
+    def __init__(self, pool, board, configs, maxIters, priority, checkpoint, notify):
+        self.id = next(Job.ids)
+        self.board = board
+        self.maxIters = maxIters
+        self.checkpoint = checkpoint
+        self.notify = notify
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.winner = None
+        self.result = None
+        self.moves = None
+        self.iterations = 0
+        self.generated = None
+        self.jobs = []
+        memory = None
+        if pool.memoryLimit is not None:
+            memory = pool.memoryLimit // len(configs)
+        for n, (rankReachPrune, order, seed) in enumerate(configs):
+            job = Job(pool, board, maxIters, rankReachPrune, priority,
+                      checkpoint if n == 0 else None, order, seed, memory=memory)
+            job.race = self
+            self.jobs.append(job)
+
+    def settle(self, job):
+        '''
+        Called as each job finishes
+        '''
+        with self.lock:
+            if self.result is not None:
+                return
+            if job.result in (SOLVED, UNSOLVED):
+                self.winner = job
+            elif any(j.result is None for j in self.jobs):
+                return
+            best = self.winner or self.jobs[0]
+            self.moves = best.moves
+            self.iterations = best.iterations
+            self.generated = best.generated
+            self.result = best.result
+        if self.winner is not None:
+            # a winner is reported by the dispatcher, without the pool's lock held
+            for j in self.jobs:
+                if j is not job:
+                    j.cancel()
+        self.done.set()
+        if self.notify is not None:
+            self.notify.put(self)
+
+    def status(self):
+        if self.result is None:
+            return 'running'
+        if self.result in (CANCELLED, ERROR):
+            return INTRACTABLE
+        return self.result
+
+    def progress(self):
+        return max(job.progress() for job in self.jobs)
+
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        return self.status()
+
+    def stats(self):
+        '''
+        The winner's measurements, with the CPU time of every job
+        '''
+        stats = (self.winner or self.jobs[0]).stats()
+        cpu = [job.cpu for job in self.jobs if job.cpu is not None]
+        stats['cpu'] = sum(cpu) if cpu else None
+        stats['flags'] = ('%s --portfolio %d' % (stats['flags'], len(self.jobs))).strip()
+        return stats
+
+    def cancel(self):
+        for job in self.jobs:
+            job.cancel()
+
+    def promote(self):
+        for job in self.jobs:
+            job.promote()
+
+class Worker:
+    '''
+    The parent's end of a worker process
+    '''
+    def __init__(self, context, memoryLimit):
+        self.conn, child = context.Pipe()
+        self.cancel = context.Value('b', 0, lock=False)
+        self.progress = context.Value('q', 0, lock=False)
+        self.proc = context.Process(target=work, daemon=True,
+                                    args=(child, self.cancel, self.progress, memoryLimit))
+        self.proc.start()
+        child.close()
+        self.job = None
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.proc.join(STOP_WAIT)
+        if self.proc.is_alive():
+            self.proc.kill()
+            self.proc.join()
+        self.conn.close()
+
+class SolverPool:
+    '''
+    size worker processes (one per core by default).  memoryLimit caps
+    the address space of each worker in bytes, and a priority zero job that
+    runs for more than timeout seconds is cancelled and reported intractable.
+    '''
+    def __init__(self, size=None, memoryLimit=None, timeout=None):
+        self.size = size or os.cpu_count() or 1
+        self.memoryLimit = memoryLimit
+        self.timeout = timeout
+        # spawn, not fork: the parent may be running Tk and threads
+        self.context = multiprocessing.get_context('spawn')
+        self.lock = threading.Lock()
+        self.queue = []          # heap of (priority, job id, job)
+        self.closed = False
+        self.workers = [Worker(self.context, memoryLimit) for _ in range(self.size)]
+        self.wakeIn, self.wakeOut = self.context.Pipe(False)
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, board, maxIters=None, rankReachPrune=True, priority=0, checkpoint=None,
+               order='counts', seed=None, store=None):
+        '''
+        Queue a board for solving and return its Job.  With a checkpoint
+        file the search resumes from it and is saved to it.
+        '''
+        job = Job(self, board, maxIters, rankReachPrune, priority, checkpoint, order, seed, store)
+        self.enqueue([job])
+        return job
+
+    def race(self, board, configs=None, maxIters=None, priority=0, checkpoint=None, notify=None):
+        '''
+        Queue a board for solving with each of configs, by default the
+        first of PORTFOLIO for each worker, and return the Race.  Only
+        the first configuration uses the checkpoint, so a search that
+        goes on after the race should use that one.  The Race is put on
+        the queue notify, if given, once it is settled.
+        '''
+        if configs is None:
+            configs = PORTFOLIO[:self.size]
+        race = Race(self, board, configs, maxIters, priority, checkpoint, notify)
+        self.enqueue(race.jobs)
+        return race
+
+    def enqueue(self, jobs):
+        with self.lock:
+            if self.closed:
+                raise RuntimeError('pool is shut down')
+            for job in jobs:
+                heapq.heappush(self.queue, (job.priority, job.id, job))
+            self.wake()
+
+    def unqueue(self, job):
+        '''
+        Remove a job from the queue, if it is there (call with the lock held)
+        '''
+        for n, entry in enumerate(self.queue):
+            if entry[2] is job:
+                self.queue[n] = self.queue[-1]
+                self.queue.pop()
+                heapq.heapify(self.queue)
+                return True
+        return False
+
+    def cancel(self, job):
+        '''
+        Drop a queued job, or stop it if it is running
+        '''
+        with self.lock:
+            if job.result is not None:
+                return
+            job.cancelled = True
+            if self.unqueue(job):
+                job.finish(CANCELLED)
+            elif job.worker is not None and job.worker.job is job:
+                job.worker.cancel.value = CANCEL
+
+    def promote(self, job):
+        '''
+        Give a job priority zero, moving it to the head of the queue
+        '''
+        with self.lock:
+            if job.result is not None or job.priority == 0:
+                return
+            job.priority = 0
+            if self.unqueue(job):
+                heapq.heappush(self.queue, (0, job.id, job))
+                self.wake()
+
+    def wake(self):
+        '''
+        Interrupt the dispatcher's wait (call with the lock held)
+        '''
+        self.wakeOut.send(None)
+
+    def assign(self):
+        '''
+        Give queued jobs to idle workers (call with the lock held).
+        Returns the idle workers found to be dead, for replace().
+        '''
+        dead = []
+        for worker in self.workers:
+            if worker.job is not None:
+                continue
+            if not worker.proc.is_alive():
+                dead.append(worker)
+                continue
+            if not self.queue:
+                continue
+            job = heapq.heappop(self.queue)[2]
+            # cleared here, not by the worker, so that a cancel made
+            # before the worker reads the job is not lost
+            worker.cancel.value = 0
+            try:
+                worker.conn.send((job.id, job.board, job.maxIters, job.rankReachPrune,
+                                  job.order, job.seed, job.checkpoint, job.store,
+                                  job.memory))
+            except OSError:          # it died since the check above
+                heapq.heappush(self.queue, (job.priority, job.id, job))
+                dead.append(worker)
+                continue
+            job.worker = worker
+            job.started = time.time()
+            worker.job = job
+            worker.progress.value = 0
+        if self.queue and self.queue[0][0] == 0:
+            self.preempt()
+        return dead
+
+    def preempt(self):
+        '''
+        Stop a background job to free a worker (call with the lock held)
+        '''
+        jobs = [w.job for w in self.workers if w.job is not None]
+        if any(job.preempted for job in jobs):     # one is already on its way out
+            return
+        for worker in self.workers:
+            job = worker.job
+            if job is not None and job.priority > 0 and not job.cancelled:
+                job.preempted = True
+                worker.cancel.value = STOP
+                return
+
+    def dispatch(self):
+        while True:
+            with self.lock:
+                if self.closed:
+                    return
+                dead = self.assign()
+                busy = [w for w in self.workers if w.job is not None]
+            if dead:
+                for worker in dead:
+                    self.replace(worker)
+                continue
+            ready = wait([w.conn for w in busy] + [self.wakeIn], 0.5)
+            if self.wakeIn in ready:
+                while self.wakeIn.poll():
+                    self.wakeIn.recv()
+            for worker in busy:
+                if worker.conn in ready:
+                    try:
+                        jobId, result, moves, iterations, generated, cpu, rss = worker.conn.recv()
+                    except (EOFError, OSError):
+                        self.replace(worker)
+                        continue
+                    with self.lock:
+                        job, worker.job = worker.job, None
+                        if job.preempted and not job.cancelled and result == CANCELLED:
+                            job.preempted = False
+                            job.worker = None
+                            heapq.heappush(self.queue, (job.priority, job.id, job))
+                            continue
+                    job.finish(result, moves, iterations, generated, cpu, rss)
+                elif not worker.proc.is_alive():
+                    self.replace(worker)
+                elif (self.timeout is not None and worker.job.priority == 0 and
+                      time.time() - worker.job.started > self.timeout):
+                    worker.cancel.value = CANCEL
+
+    def replace(self, worker):
+        '''
+        A worker died (most likely killed for using too much memory):
+        fail its job and start a fresh worker in its place.
+        '''
+        with self.lock:
+            job = worker.job
+            worker.job = None
+            self.workers[self.workers.index(worker)] = Worker(self.context, self.memoryLimit)
+        worker.conn.close()
+        worker.proc.join(1)
+        if job is not None:
+            job.finish(INTRACTABLE, iterations=worker.progress.value)
+
+    def shutdown(self):
+        '''
+        Cancel everything and stop the workers.  Running jobs that were
+        not cancelled first save their checkpoints.
+        '''
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            for entry in self.queue:
+                entry[2].finish(CANCELLED)
+            self.queue.clear()
+            for worker in self.workers:
+                # keep the checkpoints of jobs not already cancelled
+                if worker.job is None or not worker.job.cancelled:
+                    worker.cancel.value = STOP
+            self.wake()
+        self.dispatcher.join()
+        for worker in self.workers:
+            if worker.job is not None:
+                worker.job.finish(CANCELLED)
+                worker.job = None
+            worker.stop()
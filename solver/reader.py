@@ -0,0 +1,65 @@
+# reader.py Read solver output as it is written
+'''
+A solver that writes more than a pipe buffer's worth of output blocks
+until somebody reads it, so the output of every solver process is read
+by a background thread as it arrives.  Only the interesting parts are
+kept: the moves of the solution, the progress traces written by
+--iters-display-step and the totals at the end.
+'''
+import re
+import threading
+
+solnPattern = re.compile(r'Move.*?([0-9]+).*?foundations')
+iterPattern = re.compile(r'Iteration:?\s*([0-9]+)')
+checkedPattern = re.compile(r'Total number of states checked is ([0-9]+)')
+generatedPattern = re.compile(r'This scan generated ([0-9]+) states')
+RESULTS = {'Solved!': 'solved', 'Unsolved!': 'unsolved', 'Intractable!': 'intractable'}
+
+class OutputReader(threading.Thread):
+    '''
+    Parse the output of a solver line by line until end of file.
+    '''
+    def __init__(self, stream):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.stream = stream
+        self.moves = []
+        self.iterations = 0
+        self.checked = None
+        self.generated = None
+        self.result = None
+        self.start()
+
+    def run(self):
+        try:
+            for line in self.stream:
+                self.parse(line)
+        except (OSError, ValueError):     # stream closed under us
+            pass
+
+    def parse(self, line):
+        m = solnPattern.search(line)
+        if m:
+            self.moves.append(int(m.group(1)))
+            return
+        m = iterPattern.match(line)
+        if m:
+            self.iterations = int(m.group(1))
+            return
+        m = checkedPattern.match(line)
+        if m:
+            self.checked = self.iterations = int(m.group(1))
+            return
+        m = generatedPattern.match(line)
+        if m:
+            self.generated = int(m.group(1))
+            return
+        line = line.strip()
+        if line in RESULTS:
+            self.result = RESULTS[line]
+
+    def progress(self):
+        '''
+        Number of iterations the solver has reported so far
+        '''
+        return self.iterations
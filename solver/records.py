@@ -0,0 +1,169 @@
+# records.py Log of every solve, and a tool to query it
+'''
+Every solve, in the game or in a batch run, can be logged to an SQLite
+file (solver/solves.db by default) as one row of the solves table:
+
+    time       when the solve finished
+    source     'gui', 'presolve', 'background' or 'batch'
+    key        the board's rank pattern (cache.boardKey)
+    deal       PySol deal number, if known
+    backend    'python', 'binary', 'cache', 'prefilter', 'beam' or 'quick'
+    flags      solver options, e.g. '--rank-reach-prune --max-iters 75000000'
+    status     solved, unsolved or intractable
+    exit_code  the solver's exit status (0, 255, 254), if it ran as a process
+    checked    states checked
+    generated  states generated
+    iterations iterations of the search
+    wall       wall clock seconds
+    cpu        CPU seconds
+    rss        peak resident set size in bytes during the solve
+
+Missing values are NULL.  To see where the time goes:
+
+    python -m solver.records                   totals by source, backend and status
+    python -m solver.records tiers             share of the solves settled by each backend
+    python -m solver.records slowest 20        the 20 longest solves
+    python -m solver.records deal 828132       every solve of one deal
+'''
+import os
+import sys
+import time
+import sqlite3
+import argparse
+
+DEFAULT_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'solves.db')
+
+FIELDS = [('time', 'REAL'),
+          ('source', 'TEXT'),
+          ('key', 'TEXT'),
+          ('deal', 'INTEGER'),
+          ('backend', 'TEXT'),
+          ('flags', 'TEXT'),
+          ('status', 'TEXT'),
+          ('exit_code', 'INTEGER'),
+          ('checked', 'INTEGER'),
+          ('generated', 'INTEGER'),
+          ('iterations', 'INTEGER'),
+          ('wall', 'REAL'),
+          ('cpu', 'REAL'),
+          ('rss', 'INTEGER')]
+NAMES = [name for name, kind in FIELDS]
+
+def peakRSS(usage):
+    '''
+    Peak resident set size in bytes from a resource usage
+    '''
+    # ru_maxrss is in kilobytes on Linux and bytes on the Mac
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+def resetPeak():
+    '''
+    Start the peak resident set size of this process afresh, so that a
+    worker that runs many jobs can measure each one with jobPeakRSS().
+    Returns False where that cannot be done (anywhere but Linux).
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as fout:
+            fout.write('5')
+    except OSError:
+        return False
+    return True
+
+def jobPeakRSS():
+    '''
+    Peak resident set size in bytes of this process since resetPeak(),
+    or None if it cannot be read
+    '''
+    try:
+        with open('/proc/self/status') as fin:
+            for line in fin:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+class SolveLog:
+    def __init__(self, filename=DEFAULT_LOG):
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS solves (%s)' %
+                          ', '.join('%s %s' % f for f in FIELDS))
+        present = {row[1] for row in self.conn.execute('PRAGMA table_info(solves)')}
+        for name, kind in FIELDS:
+            if name not in present:
+                self.conn.execute('ALTER TABLE solves ADD COLUMN %s %s' % (name, kind))
+        self.conn.execute('CREATE INDEX IF NOT EXISTS solves_key ON solves (key)')
+        self.conn.commit()
+
+    def add(self, record):
+        self.addMany([record])
+
+    def addMany(self, records):
+        '''
+        Append records, dicts with any of the fields (time defaults to now)
+        '''
+        now = time.time()
+        rows = [tuple(r.get(name, now if name == 'time' else None) for name in NAMES)
+                for r in records]
+        with self.conn:
+            self.conn.executemany('INSERT INTO solves (%s) VALUES (%s)' %
+                                  (', '.join(NAMES), ', '.join('?'*len(NAMES))), rows)
+
+    def query(self, sql, params=()):
+        return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+def table(rows, headings, out):
+    rows = [['' if v is None else ('%.2f' % v if isinstance(v, float) else str(v)) for v in row]
+            for row in rows]
+    widths = [max([len(h)] + [len(r[i]) for r in rows]) for i, h in enumerate(headings)]
+    for row in [headings] + rows:
+        out.write('  '.join(v.rjust(w) for v, w in zip(row, widths)).rstrip() + '\n')
+
+def main(argv=None, out=sys.stdout):
+    parser = argparse.ArgumentParser(prog='python -m solver.records',
+                                     description='Query the log of solves.')
+    parser.add_argument('--log', default=DEFAULT_LOG)
+    parser.add_argument('report', nargs='?', default='summary',
+                        choices=['summary', 'tiers', 'slowest', 'deal', 'key'])
+    parser.add_argument('arg', nargs='?', help='count for slowest, deal number or rank pattern')
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.log):
+        parser.error('no log at %s' % args.log)
+    log = SolveLog(args.log)
+    if args.report == 'summary':
+        rows = log.query('SELECT source, backend, status, COUNT(*), SUM(wall), SUM(cpu), '
+                         'SUM(checked), CAST(SUM(checked)/SUM(wall) AS INTEGER), MAX(rss)/1048576 '
+                         'FROM solves '
+                         'GROUP BY source, backend, status ORDER BY SUM(wall) DESC')
+        table(rows, ['source', 'backend', 'status', 'solves', 'wall', 'cpu',
+                     'checked', 'per sec', 'MB'], out)
+    elif args.report == 'tiers':
+        rows = log.query('SELECT source, backend, COUNT(*), '
+                         '100.0 * COUNT(*) / (SELECT COUNT(*) FROM solves AS s '
+                         'WHERE s.source = solves.source), 1000 * AVG(wall) '
+                         'FROM solves GROUP BY source, backend ORDER BY source, COUNT(*) DESC')
+        table(rows, ['source', 'backend', 'solves', 'percent', 'ms each'], out)
+    else:
+        columns = 'time, source, deal, backend, status, checked, wall, cpu, rss/1048576, key'
+        headings = ['time', 'source', 'deal', 'backend', 'status', 'checked', 'wall', 'cpu',
+                    'MB', 'key']
+        if args.report == 'slowest':
+            rows = log.query('SELECT %s FROM solves ORDER BY wall DESC LIMIT ?' % columns,
+                             (int(args.arg or 20),))
+        elif args.report == 'deal':
+            rows = log.query('SELECT %s FROM solves WHERE deal = ? ORDER BY time' % columns,
+                             (int(args.arg),))
+        else:
+            rows = log.query('SELECT %s FROM solves WHERE key = ? ORDER BY time' % columns,
+                             (args.arg,))
+        rows = [(time.strftime('%Y-%m-%d %H:%M', time.localtime(r[0])),) + tuple(r[1:])
+                for r in rows]
+        table(rows, headings, out)
+    log.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+# store.py Visited sets that hold more states in less memory
+'''
+The search remembers every position it has packed into an integer (see
+engine.py) in its visited set.  A Python set costs 62 to 101 bytes of
+peak memory a state, which is what ends the hardest searches.
+StateTable holds the same 64 bit keys in an open addressing hash table
+in an array, at 8 bytes a slot and no more than half full; with the old
+array still held while it doubles, that comes to 36 to 44 bytes a
+state.  (Both measured over 2M iterations of deals 13 and 64.)  It is
+slower, since each lookup runs in Python.
+
+A StateTable grows in memory up to maxBytes.  Past that, if it has a
+spill directory, new states go to a second table of the same kind in a
+memory mapped file there, which grows without limit and is paged in and
+out by the operating system.  A search that would have run out of
+memory then gets slower instead of failing.  Without a spill directory
+a full table raises MemoryError, as a set would.
+
+Both kinds work with Search(visited=...) and can be checkpointed.
+'''
+import os
+import mmap
+import array
+import tempfile
+
+EMPTY = 0                    # keys are stored plus one, so no key is EMPTY
+MULTIPLIER = 0x9E3779B97F4A7C15
+MASK = (1 << 64) - 1
+MIN_BITS = 16
+
+class Table:
+    '''
+    Open addressing with linear probing over a sequence of 2**bits
+    unsigned 64 bit slots
+    '''
+    def __init__(self, slots, bits):
+        self.slots = slots
+        self.bits = bits
+        self.top = (1 << bits) - 1
+        self.shift = 64 - bits
+        self.count = 0
+
+    def find(self, stored):
+        '''
+        Index of the slot holding stored, or of the empty slot where it goes
+        '''
+        slots = self.slots
+        top = self.top
+        i = (stored * MULTIPLIER & MASK) >> self.shift
+        while True:
+            s = slots[i]
+            if s == stored or s == EMPTY:
+                return i
+            i = (i + 1) & top
+
+    def full(self):
+        return 2 * (self.count + 1) > 1 << self.bits
+
+    def keys(self):
+        return (s for s in self.slots if s != EMPTY)
+
+def memoryTable(bits):
+    return Table(array.array('Q', bytes(8 << bits)), bits)
+
+class DiskTable(Table):
+    '''
+    A Table in a memory mapped temporary file in dirname
+    '''
+    def __init__(self, dirname, bits):
+        os.makedirs(dirname, exist_ok=True)
+        self.file = tempfile.TemporaryFile(dir=dirname)
+        self.file.truncate(8 << bits)
+        self.map = mmap.mmap(self.file.fileno(), 8 << bits)
+        Table.__init__(self, memoryview(self.map).cast('Q'), bits)
+
+    def close(self):
+        self.slots.release()
+        self.map.close()
+        self.file.close()
+
+class StateTable:
+    '''
+    A set of non-negative integers below 2**64 - 1, holding at most
+    maxBytes in memory (no limit if None) and the rest, if spill names a
+    directory, on disk
+    '''
+    def __init__(self, maxBytes=None, spill=None, bits=MIN_BITS):
+        self.maxBytes = maxBytes
+        self.spill = spill
+        self.ram = memoryTable(bits)
+        self.disk = None
+
+    def __len__(self):
+        return self.ram.count + (self.disk.count if self.disk is not None else 0)
+
+    def __contains__(self, key):
+        # the search asks this for every move, so the probe is written out
+        stored = key + 1
+        ram = self.ram
+        slots = ram.slots
+        top = ram.top
+        i = (stored * MULTIPLIER & MASK) >> ram.shift
+        while True:
+            s = slots[i]
+            if s == stored:
+                return True
+            if s == EMPTY:
+                break
+            i = (i + 1) & top
+        disk = self.disk
+        return disk is not None and disk.slots[disk.find(stored)] == stored
+
+    def add(self, key):
+        stored = key + 1
+        ram = self.ram
+        i = ram.find(stored)
+        if ram.slots[i] == stored:
+            return
+        table = self.disk
+        if table is None:
+            if not ram.full():
+                ram.slots[i] = stored
+                ram.count += 1
+                return
+        else:
+            i = table.find(stored)
+            if table.slots[i] == stored:
+                return
+            if not table.full():
+                table.slots[i] = stored
+                table.count += 1
+                return
+        table = self.grow()
+        table.slots[table.find(stored)] = stored
+        table.count += 1
+
+    def grow(self):
+        '''
+        Make room for another state, returning the table to put it in
+        '''
+        if self.disk is None:
+            bits = self.ram.bits + 1
+            if self.maxBytes is None or 8 << bits <= self.maxBytes:
+                self.ram = rehash(self.ram, memoryTable(bits))
+                return self.ram
+            if self.spill is None:
+                raise MemoryError('visited states fill %d bytes' % (8 << self.ram.bits))
+            self.disk = DiskTable(self.spill, self.ram.bits)
+            return self.disk
+        old = self.disk
+        self.disk = rehash(old, DiskTable(self.spill, old.bits + 1))
+        old.close()
+        return self.disk
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
+
+    def __getstate__(self):
+        # the disk table is saved as its keys, and goes back to disk when loaded
+        disk = None
+        if self.disk is not None:
+            disk = array.array('Q', self.disk.keys())
+        return {'maxBytes': self.maxBytes, 'spill': self.spill,
+                'ram': self.ram.slots, 'bits': self.ram.bits, 'count': self.ram.count,
+                'disk': disk}
+
+    def __setstate__(self, state):
+        self.maxBytes = state['maxBytes']
+        self.spill = state['spill']
+        self.ram = Table(state['ram'], state['bits'])
+        self.ram.count = state['count']
+        self.disk = None
+        if state['disk'] is not None:
+            bits = self.ram.bits
+            while 2 * len(state['disk']) >= 1 << bits:
+                bits += 1
+            self.disk = DiskTable(self.spill, bits)
+            for stored in state['disk']:
+                self.disk.slots[self.disk.find(stored)] = stored
+            self.disk.count = len(state['disk'])
+
+def rehash(old, new):
+    for stored in old.keys():
+        new.slots[new.find(stored)] = stored
+    new.count = old.count
+    return new
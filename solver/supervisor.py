@@ -0,0 +1,211 @@
+# supervisor.py Run solver processes that can be reliably stopped
+'''
+Each solver is started directly (no shell) as the leader of its own
+process group, so killing the group takes the solver and anything it
+started with it.  A wall clock limit is enforced by a timer, and on
+POSIX systems the address space of the solver is capped with
+RLIMIT_AS.  Every live process is recorded, and all of them are killed
+when the interpreter exits.
+
+The cap is not set with preexec_fn, which can deadlock the child when
+the parent has threads, as the game does.  Where resource.prlimit is
+available (Linux) it is set on the child just after it starts, before
+it is sent the board; elsewhere the solver is started through sh,
+which sets it with ulimit and then execs the solver in its place.
+
+Where os.wait4 is available the solver is reaped with it, so stats()
+can report the CPU time and peak memory of that solver alone.
+'''
+import os
+import time
+import signal
+import atexit
+import threading
+import subprocess
+from .reader import OutputReader
+from .records import peakRSS
+
+POSIX = os.name == 'posix'
+WAIT4 = hasattr(os, 'wait4')
+if POSIX:
+    import resource
+PRLIMIT = POSIX and hasattr(resource, 'prlimit')
+
+running = set()          # every SolverProcess that has not been reaped
+lock = threading.Lock()
+
+class SolverProcess:
+    '''
+    A solver run on one board.  The board is written to the solver's
+    standard input and its standard output is parsed by self.reader.
+    timeout is in seconds and memoryLimit in bytes; None means no limit.
+    '''
+    def __init__(self, args, board, timeout=None, memoryLimit=None, cwd=None):
+        self.args = args
+        self.timedOut = False
+        self.killed = False
+        self.started = time.time()
+        self.finished = None
+        self.usage = None
+        self.waitLock = threading.Lock()
+        kwargs = {}
+        command = args
+        if POSIX:
+            kwargs['start_new_session'] = True
+            if memoryLimit is not None and not PRLIMIT:
+                command = limitCommand(args, memoryLimit)
+        else:
+            kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     universal_newlines=True, cwd=cwd, **kwargs)
+        if POSIX and memoryLimit is not None and PRLIMIT:
+            limitMemory(self.proc.pid, memoryLimit)
+        self.reader = OutputReader(self.proc.stdout)
+        with lock:
+            running.add(self)
+        self.timer = None
+        if timeout is not None:
+            self.timer = threading.Timer(timeout, self.timeUp)
+            self.timer.daemon = True
+            self.timer.start()
+        try:
+            self.proc.stdin.write(board)
+            self.proc.stdin.close()
+        except OSError:          # solver died before reading the board
+            pass
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def reap(self, block=False):
+        '''
+        Collect the solver's exit status and resource usage, waiting
+        for it to exit if block is true.  Returns the exit status, or
+        None if it is still running.
+        '''
+        with self.waitLock:
+            proc = self.proc
+            if proc.returncode is None:
+                if WAIT4:
+                    pid, code, usage = os.wait4(proc.pid, 0 if block else os.WNOHANG)
+                    if pid == 0:
+                        return None
+                    proc.returncode = os.waitstatus_to_exitcode(code)
+                    self.usage = usage
+                elif block:
+                    proc.wait()
+                elif proc.poll() is None:
+                    return None
+                self.finished = time.time()
+        return proc.returncode
+
+    def poll(self):
+        '''
+        Exit status of the solver, or None if it is still running
+        '''
+        status = self.reap()
+        if status is not None:
+            self.reaped()
+        return status
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        while self.poll() is None:
+            if deadline is not None and time.time() > deadline:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            time.sleep(0.05)
+        return self.proc.returncode
+
+    def status(self):
+        '''
+        'running', 'solved', 'unsolved' or 'intractable' (which covers
+        running out of iterations, time or memory)
+        '''
+        status = self.poll()
+        if status is None:
+            return 'running'
+        if status == 0:
+            return 'solved'
+        if status == 255:
+            return 'unsolved'
+        return 'intractable'
+
+    @property
+    def moves(self):
+        return self.reader.moves
+
+    def progress(self):
+        return self.reader.progress()
+
+    def stats(self):
+        '''
+        Measurements of the solve for the log of solves
+        '''
+        reader = self.reader
+        end = self.finished or time.time()
+        stats = {'exit_code': self.proc.returncode, 'checked': reader.checked,
+                 'generated': reader.generated, 'iterations': reader.iterations,
+                 'wall': end - self.started, 'flags': ' '.join(self.args[1:])}
+        if self.usage is not None:
+            stats['cpu'] = self.usage.ru_utime + self.usage.ru_stime
+            stats['rss'] = peakRSS(self.usage)
+        return stats
+
+    def timeUp(self):
+        if self.reap() is None:
+            self.timedOut = True
+            self.kill()
+
+    def kill(self):
+        '''
+        Kill the solver's whole process group and reap the solver.
+        '''
+        if self.reap() is None:
+            self.killed = True
+            try:
+                if POSIX:
+                    os.killpg(self.proc.pid, signal.SIGKILL)
+                else:
+                    self.proc.kill()
+            except OSError:      # already gone
+                pass
+        self.reap(True)
+        self.reaped()
+
+    cancel = kill
+
+    def reaped(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.reader.join(1)      # let it see end of file
+        with lock:
+            running.discard(self)
+
+def limitMemory(pid, limit):
+    '''
+    Cap the address space of the process pid
+    '''
+    try:
+        resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+    except (OSError, ValueError):      # already gone, or the limit is above the hard one
+        pass
+
+def limitCommand(args, limit):
+    '''
+    args run through sh with the address space capped at limit bytes.
+    The arguments are passed to sh as arguments, never as script text.
+    '''
+    script = 'ulimit -v %d && exec "$@"' % (limit // 1024)
+    return ['/bin/sh', '-c', script, 'sh'] + list(args)
+
+def killAll():
+    '''
+    Kill every solver that is still running
+    '''
+    with lock:
+        procs = list(running)
+    for proc in procs:
+        proc.kill()
+
+atexit.register(killAll)
@@ -4,14 +4,14 @@ The visual interface for black hole solitaire.
 The view knows about the model, but not vice versa
 The canvas widget is used for both view and controller.
 '''
-import sys, os, itertools, time
+import os, time
 try:
     import tkinter as tk
     from tkinter import messagebox
 except ImportError:
     import Tkinter as tk
     import tkMessageBox as messagebox
-from model import SUIT_NAMES, RANK_NAMES, ALLRANKS, SUIT_SYMBOLS, Card
+from model import SUIT_NAMES, RANK_NAMES, ALLRANKS, HOLE
 
 
 CARDWIDTH = 85
@@ -33,22 +33,76 @@ SELECT_CURSOR = 'hand2'
 
 SUIT_FONT=("Times", "48", "bold")
 
+# Autoplay speeds, in milliseconds per move.  Moves that fall due while
+# a frame is pending are drawn together, at most one frame per FRAME_MS.
+AUTOPLAY_SPEEDS = (('Slow', 800), ('Medium', 300), ('Fast', 100), ('Fastest', 20))
+AUTOPLAY_DELAY = 300
+FRAME_MS = 50
+
 imageDict = {}   # hang on to images, or they may disappear!
+# All 52 faces in one image, a row for each suit in SUIT_NAMES order
+# and a column for each rank.  Made by makeSheet(); optional.
+SHEET = 'sheet.png'
+
+class CardImages:
+    '''
+    Card faces, each loaded the first time it is asked for: cut from the
+    sprite sheet if cardDir has one, else read from the card's GIF.
+    '''
+    def __init__(self, cardDir):
+        self.cardDir = cardDir
+        self.sheet = None           # the sheet, once read; False if there is none
+
+    def face(self, rank, suit):
+        face = imageDict.get((rank, suit))
+        if face is None:
+            face = imageDict[rank, suit] = self.load(rank, suit)
+            if len(imageDict) == len(SUIT_NAMES)*len(ALLRANKS):
+                self.sheet = False  # every face is cut; let the sheet go
+        return face
+
+    def load(self, rank, suit):
+        if self.sheet is None:
+            path = os.path.join(self.cardDir, SHEET)
+            self.sheet = tk.PhotoImage(file=path) if os.path.exists(path) else False
+        if not self.sheet:
+            return tk.PhotoImage(file=os.path.join(self.cardDir, RANK_NAMES[rank]+suit+'.gif'))
+        face = tk.PhotoImage(width=CARDWIDTH, height=CARDHEIGHT)
+        x, y = (rank-1)*CARDWIDTH, SUIT_NAMES.index(suit)*CARDHEIGHT
+        face.tk.call(face, 'copy', self.sheet, '-from', x, y, x+CARDWIDTH, y+CARDHEIGHT)
+        return face
+
+def makeSheet(cardDir):
+    '''
+    Write the sprite sheet for the GIFs in cardDir (needs a display)
+    '''
+    root = tk.Tk()
+    root.withdraw()
+    sheet = tk.PhotoImage(width=len(ALLRANKS)*CARDWIDTH, height=len(SUIT_NAMES)*CARDHEIGHT)
+    for row, suit in enumerate(SUIT_NAMES):
+        for rank in ALLRANKS:
+            face = tk.PhotoImage(file=os.path.join(cardDir, RANK_NAMES[rank]+suit+'.gif'))
+            sheet.tk.call(sheet, 'copy', face, '-to', (rank-1)*CARDWIDTH, row*CARDHEIGHT)
+    sheet.write(os.path.join(cardDir, SHEET), format='png')
+    root.destroy()
 
 class ButtonBar(tk.Canvas):
     def __init__(self, parent):
         tk.Canvas.__init__(self,parent, bg=BACKGROUND, bd=0, highlightthickness=0)
         self.configure(height=5*MARGIN,width=6*XSPACING)
         width=int(self['width'])
-        self.makeButton(width//2-15*MARGIN, 'undo')
-        self.makeButton(width//2-7*MARGIN, 'redo')
-        self.makeButton(width//2+1*MARGIN, 'solve')
-        self.makeButton(width//2+9*MARGIN, 'restart')
+        self.makeButton(width//2-19*MARGIN, 'undo')
+        self.makeButton(width//2-11*MARGIN, 'redo')
+        self.makeButton(width//2-3*MARGIN, 'play')
+        self.makeButton(width//2+5*MARGIN, 'solve')
+        self.makeButton(width//2+13*MARGIN, 'restart')
         self.place(in_=parent, relx=.5,y=0,anchor=tk.N)    
 
     def makeButton(self, left, text):
+        # the label also has the tag text+'Label', so it can be changed
         self.create_oval(left, MARGIN, left+6*MARGIN, 4*MARGIN, fill=BUTTON, outline=BUTTON, tag = text)
-        self.create_text(left+3*MARGIN,2.5*MARGIN,text=text.title(),fill=TEXT,tag=text,anchor=tk.CENTER)
+        self.create_text(left+3*MARGIN,2.5*MARGIN,text=text.title(),fill=TEXT,
+                         tag=(text, text+'Label'),anchor=tk.CENTER)
 
 class View: 
     '''
@@ -56,6 +110,11 @@ class View:
     or the back as appropriate.  Each card has the tag "card".  This is 
     crucial, since only canvas items tagged "card" will respond to mouse
     clicks.
+
+    show() only redraws what changed since the last frame: drawn holds
+    the cards each pile showed then, and items maps card ids to canvas
+    item ids so cards are moved without looking up tags.  Items are
+    given their faces the first time they are shown.
     '''
     def __init__(self, parent, quit, **kwargs):
         # quit is function to call when main window is closed
@@ -72,8 +131,20 @@ class View:
         self.menu = tk.Menu(root)         # parent constructs actual menu         
         root.config(menu=self.menu)                 
         self.tableau = []           # NW corners of the tableau piles
+        self.items = []             # canvas item of each card, by card id
+        self.faced = []             # whether each card's item has its face yet, by card id
+        self.cards = {}             # card of each canvas item
+        self.drawn = None           # cards shown on each pile, then the hole, or None
+        self.playing = None         # after() id of the next autoplay frame
+        self.speed = tk.IntVar(root, AUTOPLAY_DELAY)
+        self.scrubbed = None        # (position, length) the scrubber shows
         self.makePiles()
 
+        # moving the scrubber jumps to that move of the game
+        self.scrubber = tk.Scale(root, orient=tk.HORIZONTAL, showvalue=0, from_=0, to=0,
+                                 command=self.scrub, bg=BACKGROUND, troughcolor=PILEFILL,
+                                 bd=0, highlightthickness=0)
+        self.scrubber.pack(side=tk.BOTTOM, fill=tk.X)
         canvas = self.canvas = tk.Canvas(root, bg=BACKGROUND, cursor=DEFAULT_CURSOR, 
                                                              bd=0, highlightthickness=0, width = width)
         canvas.pack(expand=tk.YES, fill=tk.Y)
@@ -91,6 +162,7 @@ class View:
         self.buttons = ButtonBar(canvas)
         self.buttons.tag_bind('undo', '<ButtonPress-1>', self.undo)
         self.buttons.tag_bind('redo', '<ButtonPress-1>', self.redo)
+        self.buttons.tag_bind('play', '<ButtonPress-1>', self.play)
         self.buttons.tag_bind('restart', '<ButtonPress-1>', self.restart)
         self.buttons.tag_bind('solve', '<ButtonPress-1>', self.solve)
         self.show()
@@ -119,49 +191,77 @@ class View:
         self.hole = (x,y)   
             
     def loadImages(self):
-        PhotoImage = tk.PhotoImage
-        cardDir = os.path.join(self.parent.runDir, 'cards') 
-        for suit, rank in itertools.product(SUIT_NAMES, ALLRANKS):
-            face = PhotoImage(file = os.path.join(cardDir, RANK_NAMES[rank]+suit+'.gif'))               
-            imageDict[rank, suit] = face
+        '''
+        Get ready to load card faces as they are needed
+        '''
+        self.images = CardImages(os.path.join(self.parent.runDir, 'cards'))
 
     def createCards(self):
         model = self.model
         canvas = self.canvas    
+        self.items = [None]*len(model.deck)
+        self.faced = [False]*len(model.deck)
         for card in model.deck:
             c = canvas.create_image(-200, -200, image = None, anchor = tk.NW, tag = "card")
             canvas.addtag_withtag('code%s'%card.code, c)
+            self.items[card.ident] = c
+            self.cards[c] = card
+
+    def place(self, card, x, y):
+        '''
+        Move card's item to (x, y) on top of the others
+        '''
+        item = self.items[card.ident]
+        if not self.faced[card.ident]:
+            self.canvas.itemconfigure(item, image=self.images.face(card.rank, card.suit))
+            self.faced[card.ident] = True
+        self.canvas.coords(item, x, y)
+        self.canvas.tag_raise(item)
 
     def showTableau(self, k):
         '''
-        Display tableau pile number k
+        Display tableau pile number k.  Cards still where they were
+        drawn last time are left alone.
         '''
         x, y = self.tableau[k]
-        canvas = self.canvas
-        for card in self.model.tableau[k]:
-            tag = 'code%s'%card.code
-            canvas.coords(tag, x, y)
-            foto = imageDict[card.rank, card.suit]
+        pile = self.model.tableau[k]
+        drawn = self.drawn[k]
+        same = 0
+        while same < len(drawn) and same < len(pile) and drawn[same] is pile[same]:
+            same += 1
+        x += same*XOFFSET
+        for card in pile[same:]:
+            self.place(card, x, y)
             x += XOFFSET
-            canvas.itemconfigure(tag, image = foto)
-            canvas.tag_raise(tag) 
+        self.drawn[k] = tuple(pile)
             
     def showHole(self):
         '''
-        Display black hole
+        Display black hole.  Every card added since the last frame is
+        stacked in order, so undo uncovers the right one.
         '''
         x, y = self.hole
-        canvas = self.canvas
-        card = self.model.hole[-1]
-        tag = 'code%s'%card.code
-        canvas.coords(tag, x, y)
-        foto = imageDict[card.rank, card.suit]
-        canvas.itemconfigure(tag, image = foto)
-        canvas.tag_raise(tag) 
+        hole = self.model.hole
+        drawn = self.drawn[17]
+        same = 0
+        while same < len(drawn) and same < len(hole) and drawn[same] is hole[same]:
+            same += 1
+        for card in hole[same:]:
+            self.place(card, x, y)
+        self.drawn[17] = tuple(hole)
+
+    def redraw(self, celebrate=True):
+        '''
+        Display everything afresh
+        '''
+        self.drawn = None
+        self.show(celebrate)
 
     def show(self, celebrate=True):
         model = self.model
         canvas = self.canvas
+        if self.drawn is None:
+            self.drawn = [()]*18
         for k in range(17):
             self.showTableau(k)
         self.showHole()
@@ -173,6 +273,7 @@ class View:
             self.enableRedo()
         else:
             self.disableRedo()
+        self.showScrubber()
         canvas.update_idletasks()
         if model.blocked():
             messagebox.showinfo('Blocked','No more moves',parent=self.canvas)
@@ -185,52 +286,127 @@ class View:
         Clicks on the black hole are ignored.
         '''
         model = self.model
-        canvas = self.canvas
-        tag = [t for t in canvas.gettags('current') if t.startswith('code')][0]
-        code = tag[4:]             # code of the card clicked
-        for k, p in enumerate(model.tableau):
-            if p.find(code):
-                break
-        else:       # loop else
+        card = self.cards[self.canvas.find_withtag('current')[0]]
+        k, depth = model.locate(card.code)
+        if k == HOLE:
             return
+        self.pause()
         if model.move(k):
             self.show()
             
     def undo(self, event):
+        self.pause()
         self.model.undo()
         self.show()
 
     def redo(self, event):
+        self.pause()
         self.model.redo()
         self.show()  
 
     def restart(self, event):
+        self.pause()
         self.model.restart()
         self.show()
+
+    def play(self, event=None):
+        '''
+        Start playing the moves on the redo stack, or pause if playing
+        '''
+        if self.playing is not None:
+            self.pause()
+            return
+        if not self.model.canRedo():
+            return
+        self.playStart = time.time()
+        self.playFrom = self.model.position()
+        self.buttons.itemconfigure('playLabel', text='Pause')
+        self.tick()
+
+    def tick(self):
+        '''
+        Make every move that is due by now and draw them as one frame
+        '''
+        model = self.model
+        delay = self.speed.get()
+        due = self.playFrom + 1 + round((time.time()-self.playStart)*1000 / delay)
+        while model.position() < due and model.canRedo():
+            model.redo()
+        self.playing = None
+        self.show()
+        if model.canRedo():
+            self.playing = self.canvas.after(max(delay, FRAME_MS), self.tick)
+        else:
+            self.pause()
+
+    def pause(self):
+        if self.playing is not None:
+            self.canvas.after_cancel(self.playing)
+            self.playing = None
+        self.buttons.itemconfigure('playLabel', text='Play')
+
+    def setSpeed(self):
+        '''
+        The autoplay speed changed; time the next moves from now
+        '''
+        if self.playing is not None:
+            self.playStart = time.time()
+            self.playFrom = self.model.position()
+
+    def scrub(self, value):
+        '''
+        The scrubber moved: jump to that move
+        '''
+        n = int(float(value))
+        if n == self.model.position():
+            return
+        self.pause()
+        self.model.jumpTo(n)
+        self.show(False)
+
+    def showScrubber(self):
+        model = self.model
+        state = (model.position(), model.length())
+        if state == self.scrubbed:
+            return
+        self.scrubbed = state
+        self.scrubber.configure(to=state[1])
+        self.scrubber.set(state[0])
         
     def solve(self, event):
         model = self.model
         status = model.readSolution()
         if status == 'running':
-            messagebox.showinfo('Working On It','Try again in a little while',parent=self.canvas)
+            msg = 'Try again in a little while'
+            searched = model.solverProgress()
+            if searched:
+                msg += '\n\n%d positions searched so far' % searched
+            messagebox.showinfo('Working On It', msg, parent=self.canvas)
         elif status == 'unsolved':
-            messagebox.showinfo('Unsolved','No solution',parent=self.canvas)
+            msg = 'No solution from here' if model.canUndo() else 'No solution'
+            messagebox.showinfo('Unsolved', msg, parent=self.canvas)
         elif status == 'intractable':
-            if messagebox.askyesno('Intractable', 'Save game file?',parent=self.canvas):
+            msg = 'Save game file?'
+            if model.searchingOn():
+                msg = 'The search goes on in the background, so try again later.\n\n' + msg
+            if messagebox.askyesno('Intractable', msg, parent=self.canvas):
                 model.saveGame()
         else:
-            messagebox.showinfo('Solved','Press redo to see solution', parent=self.canvas) 
+            messagebox.showinfo('Solved','Press redo to step through the solution, '
+                                'or play to watch it', parent=self.canvas) 
             self.show()
 
     def disableRedo(self):
-        self.buttons.itemconfigure('redo', state=tk.HIDDEN)
+        for item in ('redo', 'play'):
+            self.buttons.itemconfigure(item, state=tk.HIDDEN)
 
     def disableUndo(self):
         for item in ('undo', 'restart'):
             self.buttons.itemconfigure(item, state=tk.HIDDEN)
 
     def enableRedo(self):
-        self.buttons.itemconfigure('redo', state=tk.NORMAL)
+        for item in ('redo', 'play'):
+            self.buttons.itemconfigure(item, state=tk.NORMAL)
 
     def enableUndo(self):
         for item in ('undo', 'restart'):
@@ -241,24 +417,19 @@ class View:
 
     def celebrate(self):
         canvas = self.canvas
-        width =  canvas.winfo_width()
-        height = canvas.winfo_height()
         deck = self.model.deck
+        self.drawn = None
         for k in range(52):
             row, col = divmod(k, 13)
             x = col * CARDWIDTH
             y = row * (CARDHEIGHT+2*MARGIN)+6*MARGIN
-            card = deck[k]
-            tag = 'code%s'%card.code
-            canvas.coords(tag, x, y)
-            canvas.tag_raise(tag)            
+            self.place(deck[k], x, y)
         canvas.update_idletasks()
         canvas.after(300, self.uncelebrate)
         
     def uncelebrate(self):
         canvas = self.canvas
-        deck = self.model.deck
         x,y = self.hole
         for item in canvas.find_withtag('card'):
             canvas.coords(item, x, y)
-        self.show(False)
+        self.redraw(False)
@@ -0,0 +1,216 @@
+# viewBench.py Count the Tk calls the view makes per move
+'''
+Replays solutions through View.show() on a canvas that only counts the
+calls made to it, so no display is needed:
+
+    python viewBench.py [deals]
+
+Reports the average number of canvas calls for a full redraw and for
+each move of the replay, which is what Redo costs, both for the view as
+it is and for the view as it was before show() kept track of what it
+had drawn (RedrawingView), and the frames and canvas calls autoplay
+takes for a whole solution at each speed (on a simulated clock).
+'''
+import sys
+import random
+import collections
+from model import Model
+import view as viewModule
+from view import View, AUTOPLAY_SPEEDS, XOFFSET
+from solver.engine import Search, parseBoard, SOLVED
+
+class CountingCanvas:
+    '''
+    Stands in for a tk.Canvas, counting calls by method name
+    '''
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.nextItem = 0
+        self.pending = None         # (ms, function) passed to after()
+
+    def create_image(self, *args, **kwargs):
+        self.calls['create_image'] += 1
+        self.nextItem += 1
+        return self.nextItem
+
+    def find_withtag(self, tag):
+        self.calls['find_withtag'] += 1
+        return range(1, self.nextItem+1)
+
+    def after(self, ms, function):
+        self.calls['after'] += 1
+        self.pending = (ms, function)
+        return 'after'
+
+    def after_cancel(self, id):
+        self.calls['after_cancel'] += 1
+        self.pending = None
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls[name] += 1
+        return call
+
+    def total(self):
+        return sum(self.calls.values())
+
+class Parent:
+    runDir = '.'
+
+class Setting:
+    '''
+    Stands in for a tk.IntVar
+    '''
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+class NoImages:
+    '''
+    Stands in for CardImages
+    '''
+    def face(self, rank, suit):
+        return None
+
+class Clock:
+    '''
+    Stands in for the time module, so after() delays pass at once
+    '''
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+class RedrawingView(View):
+    '''
+    The view as it was before show() only drew what changed: every card
+    is moved, given its face and raised, by its tag, at every frame
+    '''
+    def showTableau(self, k):
+        x, y = self.tableau[k]
+        canvas = self.canvas
+        for card in self.model.tableau[k]:
+            tag = 'code%s'%card.code
+            canvas.coords(tag, x, y)
+            x += XOFFSET
+            canvas.itemconfigure(tag, image = self.images.face(card.rank, card.suit))
+            canvas.tag_raise(tag)
+
+    def showHole(self):
+        x, y = self.hole
+        canvas = self.canvas
+        card = self.model.hole[-1]
+        tag = 'code%s'%card.code
+        canvas.coords(tag, x, y)
+        canvas.itemconfigure(tag, image = self.images.face(card.rank, card.suit))
+        canvas.tag_raise(tag)
+
+def makeView(model, viewClass=View):
+    '''
+    A viewClass drawing on a CountingCanvas, built without a Tk root
+    '''
+    view = viewClass.__new__(viewClass)
+    view.parent = model.parent
+    view.model = model
+    view.canvas = CountingCanvas()
+    view.buttons = CountingCanvas()
+    view.scrubber = CountingCanvas()
+    view.tableau = []
+    view.items = []
+    view.cards = {}
+    view.images = NoImages()
+    view.drawn = None
+    view.playing = None
+    view.speed = Setting(viewModule.AUTOPLAY_DELAY)
+    view.scrubbed = None
+    view.makePiles()
+    view.createCards()
+    return view
+
+def solvedDeals(count, seed=1):
+    '''
+    Shuffled decks that have solutions, with their solutions
+    '''
+    model = Model(Parent())
+    rand = random.Random(seed)
+    found = []
+    while len(found) < count:
+        model.shuffle(model.deck[:1] + rand.sample(model.deck[1:], 51))
+        model.deal(False)
+        search = Search(*parseBoard(model.boardString()))
+        if search.run(200000) == SOLVED:
+            found.append((list(model.deck), search.moves))
+    return found
+
+def autoplay(view, delay):
+    '''
+    Play the redo stack at delay milliseconds per move.  Returns the
+    number of frames drawn.
+    '''
+    clock = viewModule.time = Clock()
+    canvas = view.canvas
+    view.speed.set(delay)
+    view.play()
+    frames = 1
+    while canvas.pending is not None:
+        ms, function = canvas.pending
+        canvas.pending = None
+        clock.now += ms / 1000.0
+        function()
+        frames += 1
+    return frames
+
+def replay(model, view, deals):
+    '''
+    Redo each solution a move at a time.  Returns the canvas calls for
+    the full redraws, the canvas calls for the moves and the moves.
+    '''
+    canvas = view.canvas
+    full = moves = perMove = 0
+    for deck, solution in deals:
+        model.shuffle(deck)
+        model.deal(False)
+        model.redoStack = list(reversed(solution))
+        start = canvas.total()
+        view.redraw(False)
+        full += canvas.total() - start
+        start = canvas.total()
+        while model.canRedo():
+            model.redo()
+            view.show(False)
+        perMove += canvas.total() - start
+        moves += len(solution)
+    return full, perMove, moves
+
+def main(count=20):
+    model = Model(Parent())
+    deals = solvedDeals(count)
+    fullBefore, perMoveBefore, moves = replay(model, makeView(model, RedrawingView), deals)
+    view = makeView(model)
+    canvas = view.canvas
+    full, perMove, moves = replay(model, view, deals)
+    print('deals %d  moves %d' % (count, moves))
+    print('              before   after')
+    print('full redraw  %7.1f %7.1f canvas calls' % (fullBefore / count, full / count))
+    print('per move     %7.1f %7.1f canvas calls' % (perMoveBefore / moves, perMove / moves))
+    for label, delay in AUTOPLAY_SPEEDS:
+        frames = calls = 0
+        for deck, solution in deals:
+            model.shuffle(deck)
+            model.deal(False)
+            model.redoStack = list(reversed(solution))
+            view.redraw(False)
+            start = canvas.total()
+            frames += autoplay(view, delay)
+            calls += canvas.total() - start
+        print('autoplay %-8s %5.1f frames  %6.1f canvas calls per solution' %
+              (label, frames / count, calls / count))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)